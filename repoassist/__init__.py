@@ -21,15 +21,17 @@ if sys.version_info < MIN_PYTHON:
     sys.exit('Python %s.%s or later is required.\n' % MIN_PYTHON)
 
 try:
-    p = subprocess.run(('git', '--version'), shell=True, check=True,
+    p = subprocess.run(('git', '--version'), check=True,
                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8')
 
     m = re.search(r'(\d+)\.(\d+)\.(\d+)', p.stdout)
     if m:
         git_version = (int(m.group(1)), int(m.group(2)), int(m.group(3)))
         if git_version < MIN_GIT:
-            sys.exit(f'Git {git_version[0].git_version[1].git_version[2]} or later is required.\n')
+            sys.exit('Git %s.%s.%s or later is required.\n' % MIN_GIT)
     else:
         sys.exit(f'Error occured when check git version: {p.stdout}\n')
+except FileNotFoundError:
+    sys.exit('Git is required.\n')
 except subprocess.CalledProcessError as e:
     sys.exit(f'Error occured when check git version: {e.output}\n')
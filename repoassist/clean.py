@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 
 
+import os
 import stat
 import shutil
+import fnmatch
+import concurrent.futures
 from pathlib import Path
 
 from . import settings
@@ -14,34 +17,85 @@ from . import logger
 _logger = logger.get_logger(__name__)
 
 
-def clean(cwd='.'):
-    _clean_files(cwd)
-    _clean_dirs(cwd)
+def clean(cwd='.', dry_run=False):
+    cwd = Path(cwd).resolve()
+    files_paths, dirs_paths = _find_paths_to_clean(cwd)
+    for path in files_paths:
+        _logger.info(f'{"Would remove" if dry_run else "Remove"} file: {path.relative_to(cwd)}')
+    for path in dirs_paths:
+        _logger.info(f'{"Would remove" if dry_run else "Remove"} directory: {path.relative_to(cwd)}')
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=settings.CLEAN_WORKERS) as executor:
+        files_sizes = executor.map(_remove_file, files_paths, [dry_run] * files_paths.__len__())
+        dirs_sizes = executor.map(_remove_dir, dirs_paths, [dry_run] * dirs_paths.__len__())
+        freed_bytes = sum(files_sizes) + sum(dirs_sizes)
+    
+    _logger.info(f'{"Would remove" if dry_run else "Removed"} {files_paths.__len__()} files and '
+                 f'{dirs_paths.__len__()} directories, {freed_bytes} bytes {"to free" if dry_run else "freed"}.')
+    
+    return files_paths.__len__(), dirs_paths.__len__(), freed_bytes
 
 
-def _clean_files(cwd, files_list=None):
+def _find_paths_to_clean(cwd, files_list=None, dirs_list=None, skip_list=None):
     files_list = settings.FILES_TO_CLEAN if files_list is None else files_list
-    for file_pattern in files_list:
-        files_paths = sorted(Path(cwd).glob(file_pattern))
-        for file_path in files_paths:
-            _logger.info(f'Remove file: {file_path.relative_to(Path(cwd).resolve())}')
-            file_path.unlink()
-
-
-def _clean_dirs(cwd, dirs_list=None):
     dirs_list = settings.DIRS_TO_CLEAN if dirs_list is None else dirs_list
+    skip_list = settings.DIRS_TO_SKIP_WHILE_CLEANING if skip_list is None else skip_list
+    
     for directory in dirs_list:
-        if directory['flag'] == '.':
-            dirs_paths = sorted(Path(cwd).glob(directory['name']))
-        elif directory['flag'] == 'r':
-            dirs_paths = sorted(Path(cwd).rglob(directory['name']))
-        else:
+        if directory['flag'] not in ('.', 'r'):
             raise exceptions.ValueError(f'Unknown remove flag {directory["flag"]}', _logger)
+    root_dirs_patterns = [directory['name'] for directory in dirs_list]
+    recursive_dirs_patterns = [directory['name'] for directory in dirs_list if directory['flag'] == 'r']
+    
+    files_paths = []
+    dirs_paths = []
+    dirs_to_scan = [Path(cwd)]
+    while dirs_to_scan:
+        dir_path = dirs_to_scan.pop()
+        is_root = dir_path == Path(cwd)
+        dirs_patterns = root_dirs_patterns if is_root else recursive_dirs_patterns
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError as e:
+            _logger.warning(f'Directory {dir_path} not scanned: {e}')
+            continue
+        
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if _is_matched(entry.name, dirs_patterns):
+                    dirs_paths.append(Path(entry.path))
+                elif not _is_matched(entry.name, skip_list):
+                    dirs_to_scan.append(Path(entry.path))
+            elif is_root and _is_matched(entry.name, files_list):
+                files_paths.append(Path(entry.path))
+                
+    return sorted(files_paths), sorted(dirs_paths)
+
+
+def _is_matched(name, patterns):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def _remove_file(path, dry_run):
+    size = path.lstat().st_size
+    if not dry_run:
+        path.unlink()
+        
+    return size
+    
 
-        for dir_path in dirs_paths:
-            if dir_path.is_dir():
-                _logger.info(f'Remove directory: {dir_path.relative_to(Path(cwd).resolve())}')
-                shutil.rmtree(dir_path, ignore_errors=False, onerror=_error_remove_readonly)
+def _remove_dir(path, dry_run):
+    size = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    if not dry_run:
+        shutil.rmtree(path, ignore_errors=False, onerror=_error_remove_readonly)
+    
+    return size
 
 
 def _error_remove_readonly(_action, name, _exc):
@@ -25,26 +25,50 @@ def main():
     subparsers = parser.add_subparsers(help='Available commands are:', dest='command', required=True)
     parser.add_argument('-q', '--quiet', dest='quiet', action='store_true', default=False, help='Disable output')
     parser.add_argument('-d', '--debug', dest='debug', action='store_true', default=False, help='Enable debug output')
+    parser.add_argument('--json-log', dest='json_log', action='store_true', default=False, 
+                        help='Write log records as JSON lines')
+    parser.add_argument('--queue-log', dest='queue_log', action='store_true', default=False, 
+                        help='Write log records from a background thread')
     subparsers.add_parser('update_reqs', 
                           help='Prepare requirements.txt and requirements-dev.txt files. If file exists, updates it.')
     release_parser = subparsers.add_parser('release', help='Prepare a source distribution package.')
     release_parser.add_argument('force', nargs='?', action='store', default=False, 
                                 help='Force action, no repository check, no git check.')
+    release_parser.add_argument('--profile', dest='profile', action='store_true', default=False, 
+                                help='Show the time, subprocesses and bytes written of every release phase. '
+                                     'Bytes are reported only where /proc/self/io is available.')
+    release_parser.add_argument('--profile-output', dest='profile_output', action='store', default=None, 
+                                help='Write the release profile to the given JSON file.')
     install_parser = subparsers.add_parser('install', help='Install a package.')
     install_parser.add_argument('force', nargs='?', action='store', default=False, 
                                 help='Force action, no repository check, no git check.')    
+    install_parser.add_argument('--profile', dest='profile', action='store_true', default=False, 
+                                help='Show the time, subprocesses and bytes written of every install phase. '
+                                     'Bytes are reported only where /proc/self/io is available.')
+    install_parser.add_argument('--profile-output', dest='profile_output', action='store', default=None, 
+                                help='Write the install profile to the given JSON file.')
     subparsers.add_parser('upload', help='Upload a source distribution package to the cloud.')
     subparsers.add_parser('list_cloud', help='List buckets on the cloud server.')
     subparsers.add_parser('download_package', help='Download package from the cloud server.')
-    subparsers.add_parser('clean', help='Clean repository from dummy files.')
+    clean_parser = subparsers.add_parser('clean', help='Clean repository from dummy files.')
+    clean_parser.add_argument('--dry-run', dest='dry_run', action='store_true', default=False, 
+                              help='Only report what would be removed.')
     subparsers.add_parser('coverage_report', help='Show the html coverage report in the default system browser.')
     subparsers.add_parser('update', help='Update Repoassist to version from installed Pyrepogen.')
     format_parser = subparsers.add_parser('format', help='Format a python source file using autopep8.')
-    format_parser.add_argument('path', action='store', default=None, help='Path to the python source file.')
+    format_parser.add_argument('path', nargs='?', action='store', default=None, help='Path to the python source file.')
+    format_parser.add_argument('--all', dest='all', action='store_true', default=False, 
+                               help='Format and lint all python files of the repository.')
+    format_parser.add_argument('--since', dest='since', action='store', default=None, 
+                               help='Format and lint only python files changed since the given git reference.')
+    lint_parser = subparsers.add_parser('lint', help='Lint python files of the repository using flake8.')
+    lint_parser.add_argument('--since', dest='since', action='store', default=None, 
+                             help='Lint only python files changed since the given git reference.')
 
     args = parser.parse_args()
     
     logger.set_level(_logger, args)
+    logger.set_handlers(_logger, args)
     
     if args.command:
         cwd = Path().cwd()
@@ -70,20 +94,28 @@ def main():
             elif command == 'download_package':
                 cloud.download_package(cwd)
             elif command == 'format':
-                formatter.format_file(args.path, cwd=cwd)
+                if args.all or args.since:
+                    formatter.format_files(since=args.since, cwd=cwd)
+                elif args.path:
+                    formatter.format_file(args.path, cwd=cwd)
+                else:
+                    raise exceptions.ValueError('Specify a path or use the --all or --since option.', _logger)
+            elif command == 'lint':
+                formatter.lint_files(since=args.since, cwd=cwd)
             elif command == 'coverage_report':
                 formatter.coverage_report(cwd)
             elif command == 'update':
                 if not shutil.which('pyrepogen'):
                     raise exceptions.RuntimeError('Pyrepogen not found. '
                                                   'Please check if it is installed properly', _logger)
-                print(utils.execute_cmd(('pyrepogen', '-u', '.'), cwd).strip())
+                utils.stream_cmd(('pyrepogen', '-u', '.'), print, cwd)
             elif command == 'clean':
-                clean.clean(cwd)
+                clean.clean(cwd, dry_run=args.dry_run)
             else:
                 _logger.error('Invalid command.')
         except exceptions.PyRepoGenError as e:
             e.logger.error(str(e))
+            logger.stop_queues()
             sys.exit('Repoasist error!')
             
     
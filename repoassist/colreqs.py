@@ -2,8 +2,18 @@
 # -*- coding: utf-8 -*-
 
 
+import os
+import ast
+import sys
+import json
+import sysconfig
+import concurrent.futures
 from pathlib import Path
-from pipreqs import pipreqs
+
+try:
+    import importlib.metadata as importlib_metadata
+except ImportError:
+    import importlib_metadata
 
 from . import settings
 from . import logger
@@ -32,15 +42,188 @@ def collect_reqs_latest(config, prompt=False, cwd='.'):
 def collect_reqs_specific(config, prompt=False, cwd='.'):
     if prompt:
         _prompt_and_clean(cwd)
-    candidates = pipreqs.get_all_imports(str(cwd), extra_ignore_dirs=config.pipreqs_ignore)
-    candidates = pipreqs.get_pkg_names(candidates)
-    local = pipreqs.get_import_local(candidates)
-    difference = [x for x in candidates
-                  if x.lower() not in [z['name'].lower() for z in local]]
-    imports = local + pipreqs.get_imports_info(difference)
-    reqs = [f"{item['name']}=={item['version']}" for item in imports if 'INFO' not in item]
+    imports = _get_all_imports(cwd, extra_ignore_dirs=config.pipreqs_ignore)
+    distributions = _get_packages_distributions()
+    
+    candidates = {}
+    for name in imports:
+        candidates.setdefault(name.split('.')[0], set()).add(name)
+    
+    reqs = {}
+    not_installed = []
+    for candidate in sorted(candidates):
+        if candidate not in distributions:
+            not_installed.append(candidate)
+            continue
+        candidate_distributions = distributions[candidate]
+        if candidate_distributions.__len__() > 1:
+            candidate_distributions = _resolve_namespace_distributions(candidate, candidates[candidate],
+                                                                       candidate_distributions)
+        for distribution in candidate_distributions:
+            reqs[distribution.metadata['Name'].lower()] = f"{distribution.metadata['Name']}=={distribution.version}"
+    if not_installed:
+        _logger.warning(f'Imported packages not installed, not added to requirements: {", ".join(not_installed)}')
             
-    return reqs
+    return [reqs[name] for name in sorted(reqs)]
+
+
+def _get_all_imports(cwd, extra_ignore_dirs=None):
+    ignore_dirs = settings.DIRS_TO_SKIP_WHILE_COLLECTING_REQS + \
+        [os.path.basename(os.path.realpath(path)) for path in extra_ignore_dirs or []]
+    
+    local_names = set()
+    files = {}
+    for root, dirs, filenames in os.walk(cwd):
+        dirs[:] = [dirname for dirname in dirs if dirname not in ignore_dirs]
+        local_names.update(dirs)
+        for filename in filenames:
+            if filename.endswith('.py'):
+                local_names.add(filename[:-len('.py')])
+                path = os.path.realpath(os.path.join(root, filename))
+                stat = os.stat(path)
+                files[path] = [stat.st_mtime_ns, stat.st_size]
+    
+    root = os.path.realpath(cwd)
+    cache = _read_imports_cache()
+    repo_cache = cache.get(root, {})
+    imports = {path: repo_cache[path]['imports'] for path, key in files.items() 
+               if path in repo_cache and repo_cache[path]['key'] == key}
+    paths_to_parse = sorted(set(files) - set(imports))
+    if paths_to_parse.__len__() >= settings.IMPORTS_POOL_MIN_FILES:
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            parsed_imports = list(executor.map(_parse_imports, paths_to_parse, chunksize=16))
+    else:
+        parsed_imports = [_parse_imports(path) for path in paths_to_parse]
+    
+    for path, file_imports in zip(paths_to_parse, parsed_imports):
+        if file_imports is None:
+            _logger.warning(f'File {path} could not be parsed, its imports are skipped.')
+            continue
+        imports[path] = file_imports
+        repo_cache[path] = {'key': files[path], 'imports': file_imports}
+    if paths_to_parse or repo_cache.keys() - files.keys():
+        cache = _read_imports_cache()
+        cache[root] = {path: repo_cache[path] for path in files if path in repo_cache}
+        _write_imports_cache(cache)
+    
+    skipped_names = local_names | _get_stdlib_module_names()
+    all_imports = set()
+    for file_imports in imports.values():
+        all_imports.update(name for name in file_imports if name.split('.')[0] not in skipped_names)
+    
+    return all_imports
+
+
+def _parse_imports(path):
+    try:
+        with open(path, 'rb') as file:
+            tree = ast.parse(file.read(), filename=path)
+    except (SyntaxError, ValueError, OSError):
+        return None
+    
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imports.add(node.module)
+            imports.update(f'{node.module}.{alias.name}' for alias in node.names if alias.name != '*')
+    
+    return sorted(imports)
+
+
+def _read_imports_cache():
+    try:
+        with open(settings.IMPORTS_CACHE_PATH) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_imports_cache(cache):
+    tmp_path = settings.IMPORTS_CACHE_PATH.with_name(f'{settings.IMPORTS_CACHE_PATH.name}.{os.getpid()}.tmp')
+    try:
+        settings.IMPORTS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w') as file:
+            json.dump(cache, file)
+        os.replace(tmp_path, settings.IMPORTS_CACHE_PATH)
+    except OSError as e:
+        _logger.debug(f'Imports cache not written: {e}')
+
+
+def _get_stdlib_module_names():
+    if hasattr(sys, 'stdlib_module_names'):
+        return set(sys.stdlib_module_names)
+    
+    names = set(sys.builtin_module_names)
+    stdlib_path = Path(sysconfig.get_paths()['stdlib'])
+    for path in list(stdlib_path.iterdir()) + list((stdlib_path / 'lib-dynload').glob('*')):
+        if path.name != 'site-packages':
+            names.add(path.name.split('.')[0])
+    
+    return names
+
+
+def _get_packages_distributions():
+    distributions = {}
+    for distribution in importlib_metadata.distributions():
+        if not distribution.metadata['Name']:
+            continue
+        top_level = distribution.read_text('top_level.txt')
+        names = set(top_level.split()) if top_level else _get_distribution_top_level(distribution)
+        for name in names:
+            distributions.setdefault(name, []).append(distribution)
+    
+    return distributions
+
+
+def _resolve_namespace_distributions(package, names, distributions):
+    modules = {distribution: _get_distribution_modules(distribution) for distribution in distributions}
+    
+    resolved = []
+    for name in sorted(names):
+        parts = name.split('.')
+        for length in range(parts.__len__(), 0, -1):
+            prefix = '.'.join(parts[:length])
+            providers = [distribution for distribution in distributions if prefix in modules[distribution]]
+            if providers:
+                if providers.__len__() == 1 and providers[0] not in resolved:
+                    resolved.append(providers[0])
+                break
+    if not resolved:
+        providers = ', '.join(sorted(distribution.metadata['Name'] for distribution in distributions))
+        _logger.warning(f'Package {package} provided by {providers} could not be resolved, '
+                        f'not added to requirements.')
+    
+    return resolved
+
+
+def _get_distribution_modules(distribution):
+    modules = set()
+    for file in distribution.files or []:
+        parts = list(Path(file).parts)
+        if not parts or Path(parts[-1]).suffix not in ('.py', '.so', '.pyd'):
+            continue
+        stem = parts.pop().split('.')[0]
+        if stem != '__init__':
+            parts.append(stem)
+        modules.add('.'.join(parts))
+    
+    return modules
+
+
+def _get_distribution_top_level(distribution):
+    names = set()
+    for file in distribution.files or []:
+        parts = Path(file).parts
+        if not parts or parts[0] in ('..', '__pycache__') or parts[0].endswith(('.dist-info', '.egg-info', '.data')):
+            continue
+        if parts.__len__() > 1:
+            names.add(parts[0])
+        elif Path(parts[0]).suffix in ('.py', '.so', '.pyd'):
+            names.add(parts[0].split('.')[0])
+    
+    return names
 
 
 def _prompt_and_clean(cwd='.'):
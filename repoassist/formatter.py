@@ -3,12 +3,17 @@
 
 
 import os
+import json
+import hashlib
 import autopep8
+import itertools
 import webbrowser
 import tempfile
+import concurrent.futures
 from pathlib import Path
 
 from . import exceptions
+from . import pygittools
 from . import utils
 from . import settings
 from . import logger
@@ -42,13 +47,151 @@ def format_file(path, with_meld=True, cwd='.'):
     
     _logger.info('Lint formatted file and show report')
     try:
-        utils.execute_cmd([settings.Tools.LINTER, str(path), f'--config={setup_file_path}'], cwd)
-    except exceptions.ExecuteCmdError as e:
-        print(e)
+        utils.stream_cmd([settings.Tools.LINTER, str(path), f'--config={setup_file_path}'], print, cwd)
+    except exceptions.ExecuteCmdError:
+        pass
     else:
         _logger.info('Linter report is empty - file ok')
         
         
+def format_files(since=None, cwd='.'):
+    paths = _get_python_files(since, cwd)
+    _logger.info(f'Format {paths.__len__()} files using {settings.Tools.FILE_FORMATTER}')
+    
+    setup_file_path = (Path(cwd) / settings.FileName.SETUP_CFG).resolve()
+    config_hash = _get_config_hash(f'autopep8 {autopep8.__version__}', setup_file_path)
+    cache = _read_cache()
+    keys = {path: _get_cache_key(Path(cwd) / path, config_hash) for path in paths}
+    paths_to_format = [path for path in paths if cache.pop(keys[path], None) is None]
+    
+    cache.update((keys[path], True) for path in paths if path not in paths_to_format)
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        results = executor.map(_fix_file, [str(Path(cwd) / path) for path in paths_to_format], 
+                               itertools.repeat(str(setup_file_path)))
+        for path, is_changed in zip(paths_to_format, results):
+            if is_changed:
+                _logger.info(f'Formatted: {path}')
+                keys[path] = _get_cache_key(Path(cwd) / path, config_hash)
+            cache[keys[path]] = True
+    
+    _logger.info(f'{paths_to_format.__len__()} files formatted, {paths.__len__() - paths_to_format.__len__()} '
+                 f'unchanged files skipped.')
+    _write_cache(cache)
+    
+    return lint_files(since, cwd)
+
+
+def lint_files(since=None, cwd='.'):
+    paths = _get_python_files(since, cwd)
+    _logger.info(f'Lint {paths.__len__()} files using {settings.Tools.LINTER}')
+    
+    setup_file_path = (Path(cwd) / settings.FileName.SETUP_CFG).resolve()
+    config_hash = _get_config_hash(_get_linter_version(cwd), setup_file_path)
+    cache = _read_cache()
+    keys = {path: _get_cache_key(Path(cwd) / path, config_hash) for path in paths}
+    paths_to_lint = [path for path in paths if cache.pop(keys[path], None) is None]
+    
+    cache.update((keys[path], True) for path in paths if path not in paths_to_lint)
+    report = {}
+    if paths_to_lint:
+        workers = min(os.cpu_count() or 1, paths_to_lint.__len__())
+        chunks = [paths_to_lint[i::workers] for i in range(workers)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk_report in executor.map(_lint_chunk, chunks, itertools.repeat(setup_file_path), 
+                                             itertools.repeat(cwd)):
+                report.update(chunk_report)
+    
+    for path in paths_to_lint:
+        if path not in report:
+            cache[keys[path]] = True
+    _write_cache(cache)
+    
+    for path in sorted(report):
+        for line in report[path]:
+            print(line)
+    issues_count = sum(lines.__len__() for lines in report.values())
+    _logger.info(f'{paths.__len__()} files checked, {paths.__len__() - paths_to_lint.__len__()} from the cache, '
+                 f'{issues_count} issues in {report.__len__()} files.')
+    
+    return report
+
+
+def _get_python_files(since, cwd):
+    if since:
+        paths = pygittools.list_changed_files(since, cwd)
+    else:
+        paths = pygittools.list_repo_tree(cwd)
+    
+    return sorted(path for path in paths if path.endswith('.py') and (Path(cwd) / path).is_file())
+
+
+def _fix_file(path, setup_file_path):
+    with open(path, encoding='utf-8', newline='') as file:
+        source = file.read()
+    options = autopep8.parse_args([f'--global-config={setup_file_path}', path], apply_config=True)
+    fixed_source = autopep8.fix_code(source, options=options)
+    if fixed_source == source:
+        return False
+    
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(fixed_source)
+        
+    return True
+
+
+def _lint_chunk(paths, setup_file_path, cwd):
+    report = {}
+    def collect_issue(line):
+        path = line.split(':', 1)[0]
+        report.setdefault(path, []).append(line)
+    
+    try:
+        utils.stream_cmd([settings.Tools.LINTER, f'--config={setup_file_path}', '--jobs=1', *paths], 
+                         collect_issue, cwd)
+    except exceptions.ExecuteCmdError as e:
+        if e.returncode != 1:
+            raise
+        
+    return report
+
+
+# Version of the linter and of its installed plugins, e.g. '7.1.1 (mccabe: 0.7.0, pycodestyle: 2.12.1, ...)'
+def _get_linter_version(cwd):
+    return f'{settings.Tools.LINTER} {utils.execute_cmd([settings.Tools.LINTER, "--version"], cwd).strip()}'
+
+
+def _get_config_hash(tool_version, setup_file_path):
+    config_hash = hashlib.sha256(f'{tool_version}:'.encode('utf-8'))
+    if setup_file_path.exists():
+        config_hash.update(setup_file_path.read_bytes())
+    
+    return config_hash.hexdigest()
+
+
+def _get_cache_key(path, config_hash):
+    return hashlib.sha256(config_hash.encode('utf-8') + Path(path).read_bytes()).hexdigest()
+
+
+def _read_cache():
+    try:
+        with open(settings.FORMATTER_CACHE_PATH) as file:
+            return dict.fromkeys(json.load(file), True)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache):
+    keys = list(cache)[-settings.FORMATTER_CACHE_MAX_ENTRIES:]
+    tmp_path = settings.FORMATTER_CACHE_PATH.with_name(f'{settings.FORMATTER_CACHE_PATH.name}.{os.getpid()}.tmp')
+    try:
+        settings.FORMATTER_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w') as file:
+            json.dump(keys, file)
+        os.replace(tmp_path, settings.FORMATTER_CACHE_PATH)
+    except OSError as e:
+        _logger.debug(f'Formatter cache not written: {e}')
+        
+
 def coverage_report(cwd='.'):
     _logger.info('Open the coverage html report in the default system browser.')
     
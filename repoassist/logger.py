@@ -2,7 +2,11 @@
 # -*- coding: utf-8 -*-
 
 
+import json
+import queue
+import atexit
 import logging
+import logging.handlers
 from pathlib import Path
 
 
@@ -13,9 +17,24 @@ WIZARD_LVL_NUM = 22
 CHECKPOINT_LVL_NUM = 23
 
 _logger_level = logging.DEBUG
+_queue_listeners = []
 root_name = ''
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+            
+        return json.dumps(entry)
+
+
 def create_logger(name=PACKAGENAME):
     global root_name
     root_name = name
@@ -59,6 +78,35 @@ def set_level(logger, args):
         logger.setLevel(logging.CRITICAL)
 
 
+def set_handlers(logger, args):
+    if getattr(args, 'json_log', False):
+        for handler in logger.handlers:
+            handler.setFormatter(JsonFormatter())
+    if getattr(args, 'queue_log', False):
+        enable_queue(logger)
+        
+        
+def enable_queue(logger):
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, logging.handlers.QueueHandler)]
+    if not handlers:
+        return None
+    
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    del logger.handlers[:]
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    _queue_listeners.append(listener)
+    
+    return listener
+
+
+@atexit.register
+def stop_queues():
+    while _queue_listeners:
+        _queue_listeners.pop().stop()
+        
+
 def tip(self, message, *args, **kws):
     if self.isEnabledFor(TIP_LVL_NUM):
         self._log(TIP_LVL_NUM, message, args, **kws) 
@@ -17,6 +17,7 @@ from . import wizard
 
 
 _logger = logger.get_logger(__name__)
+_template_environments = {}
 
 
 def generate_repo(config, cwd='.', options=None):
@@ -224,17 +225,30 @@ def _copy_file_from(src, dst, cwd, options=None, verbose=True):
         return []
 
 
+def _get_template_environment(searchpath):
+    searchpath = str(searchpath)
+    if searchpath not in _template_environments:
+        try:
+            settings.TEMPLATES_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(str(settings.TEMPLATES_CACHE_PATH))
+        except OSError as e:
+            _logger.debug(f'Templates bytecode cache disabled: {e}')
+            bytecode_cache = None
+        _template_environments[searchpath] = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=searchpath),
+                                                                bytecode_cache=bytecode_cache,
+                                                                trim_blocks=True,
+                                                                lstrip_blocks=True,
+                                                                newline_sequence='\r\n',
+                                                                keep_trailing_newline=True)
+    
+    return _template_environments[searchpath]
+
+
 def write_file_from_template(src, dst, keywords, cwd, options=None, verbose=True):
     src = src.parent / f'{src.name}{settings.JINJA2_TEMPLATE_EXT}'
     if (options and options.force) or (not Path(dst).exists()):
         file_exists = Path(dst).exists()
-        templateLoader = jinja2.FileSystemLoader(searchpath=str(Path(PARDIR) / src.parent))
-        templateEnv = jinja2.Environment(loader=templateLoader,
-                                         trim_blocks=True,
-                                         lstrip_blocks=True,
-                                         newline_sequence='\r\n',
-                                         keep_trailing_newline=True)
-        template = templateEnv.get_template(src.name)
+        template = _get_template_environment(Path(PARDIR) / src.parent).get_template(src.name)
         template.stream(keywords, options=options).dump(str(dst))
 
         if verbose:
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import json
+import time
+import contextlib
+import dataclasses
+from pathlib import Path
+
+from . import utils
+from . import pygittools
+from . import logger
+
+
+_logger = logger.get_logger(__name__)
+
+IO_STATS_PATH = Path('/proc/self/io')
+
+
+@dataclasses.dataclass
+class Phase():
+    name : str
+    wall_time : float = 0.0
+    subprocesses : int = 0
+    written_bytes : int = None
+    details : dict = dataclasses.field(default_factory=dict)
+
+
+class PhaseProfiler():
+    def __init__(self, command):
+        self.command = command
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        phase = Phase(name)
+        self.phases.append(phase)
+        start_time = time.monotonic()
+        start_subprocesses = _get_subprocess_count()
+        start_written_bytes = _get_written_bytes()
+        try:
+            yield phase
+        finally:
+            phase.wall_time = time.monotonic() - start_time
+            phase.subprocesses = _get_subprocess_count() - start_subprocesses
+            if start_written_bytes is not None:
+                phase.written_bytes = _get_written_bytes() - start_written_bytes
+
+    def get_total(self):
+        written_bytes = [phase.written_bytes for phase in self.phases if phase.written_bytes is not None]
+        return Phase('total',
+                     wall_time=sum(phase.wall_time for phase in self.phases),
+                     subprocesses=sum(phase.subprocesses for phase in self.phases),
+                     written_bytes=sum(written_bytes) if written_bytes else None)
+
+    def get_report(self):
+        return {
+            'command': self.command,
+            'phases': [dataclasses.asdict(phase) for phase in self.phases],
+            'total': dataclasses.asdict(self.get_total()),
+        }
+
+    def log_report(self, log=None):
+        log = log or _logger.info
+        log(f'{self.command.capitalize()} profile:')
+        for phase in self.phases + [self.get_total()]:
+            written_bytes = '-' if phase.written_bytes is None else f'{phase.written_bytes} B'
+            log(f'  {phase.name:<12} {phase.wall_time:8.3f} s {phase.subprocesses:4} subprocesses '
+                f'{written_bytes:>12} written')
+            for detail, value in phase.details.items():
+                log(f'    {detail:<10} {value:8.3f} s' if isinstance(value, float) else f'    {detail:<10} {value}')
+
+    def write_report(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.get_report(), file, indent=4)
+        _logger.info(f'Profile report written to {Path(path)}')
+
+
+def _get_subprocess_count():
+    return pygittools.get_spawn_count() + utils.get_spawn_count()
+
+
+# Bytes written to storage by this process and its finished subprocesses, None where /proc/self/io is missing
+def _get_written_bytes():
+    try:
+        with open(IO_STATS_PATH) as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                if key == 'write_bytes':
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return None
@@ -3,14 +3,34 @@
 
 
 import os
+import zlib
+import mmap
+import atexit
 import inspect
+import contextlib
+import threading
 import subprocess
 from pathlib import Path
+from collections import namedtuple
 
 
 __version__ = '0.1.0'
 
 GIT_SSH_COMMAND = 'GIT_SSH_COMMAND'
+GIT_DIR_NAME = '.git'
+GIT_DIR_FILE_PREFIX = 'gitdir:'
+PACKED_REFS_FILENAME = 'packed-refs'
+TAGS_REF_PREFIX = 'refs/tags/'
+STATUS_READ_SIZE = 64 * 1024
+STATUS_CONFLICT_CODES = ('DD', 'AU', 'UD', 'UA', 'DU', 'AA', 'UU')
+HASH_ABBREV_MIN_LENGTH = 7
+HASH_LENGTH = 40
+
+_work_trees = {}
+_sessions = {}
+_ref_readers = {}
+_sessions_lock = threading.Lock()
+_spawn_count = 0
 
 
 class PygittoolsError(Exception):
@@ -35,30 +55,300 @@ class NotInWorkTreeError(PygittoolsError):
 
 
 def check_work_tree(func):
+    sign = inspect.signature(func)
+    cwd_index = list(sign.parameters.keys()).index('cwd')
+    cwd_default = sign.parameters['cwd'].default
+    
     def wrapper(*args, **kwargs):
-        sign = inspect.signature(func)
-        arg_names = list(sign.parameters.keys())
-        passed = {k:v for k,v in zip(arg_names[:len(args)], args)}
-        passed.update({k:v for k,v in kwargs.items()})
-        defaults = {key:value.default for key, value in sign.parameters.items() if value.default is not inspect._empty}
-        
-        if 'cwd' in passed:
-            cwd = passed['cwd']
+        if 'cwd' in kwargs:
+            cwd = kwargs['cwd']
+        elif len(args) > cwd_index:
+            cwd = args[cwd_index]
         else:
-            cwd = defaults['cwd']
+            cwd = cwd_default
             
         if not is_work_tree(cwd):
             raise NotInWorkTreeError('Not in work tree', returncode=1)
         return func(*args, **kwargs)
          
     return wrapper
+
+
+class StatusSummary(namedtuple('StatusSummary', 'staged unstaged untracked conflicted')):
+    __slots__ = ()
+    
+    def __bool__(self):
+        return bool(self.staged or self.unstaged or self.conflicted)
+
+
+class GitSession(object):
+    def __init__(self, cwd='.'):
+        self.cwd = Path(cwd).resolve()
+        self._processes = {}
+        self._lock = threading.Lock()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        
+    def close(self):
+        with self._lock:
+            for process in self._processes.values():
+                try:
+                    process.stdin.close()
+                    process.wait()
+                except OSError:
+                    process.kill()
+            self._processes.clear()
+            
+    def check_object(self, name):
+        with self._lock:
+            header = self._query('--batch-check', name)
+        return header
+    
+    def read_object(self, name):
+        with self._lock:
+            header = self._query('--batch', name)
+            if header is None:
+                return None
+            stdout = self._processes['--batch'].stdout
+            data = stdout.read(header[2])
+            stdout.read(1)
+        return header[0], header[1], data
+    
+    def resolve(self, rev):
+        header = self.check_object(rev)
+        return header[0] if header else None
+    
+    def abbreviate(self, object_hash):
+        for length in range(HASH_ABBREV_MIN_LENGTH, HASH_LENGTH):
+            header = self.check_object(object_hash[:length])
+            if header and header[0] == object_hash:
+                return object_hash[:length]
+        return object_hash
+    
+    def _query(self, option, name):
+        if '\n' in name:
+            raise ValueError(f'Invalid object name: {name!r}', returncode=1)
+        
+        process = self._get_process(option)
+        try:
+            process.stdin.write(f'{name}\n'.encode('utf-8'))
+            process.stdin.flush()
+            line = process.stdout.readline().decode('utf-8').rstrip('\n')
+        except OSError as e:
+            self._processes.pop(option, None)
+            raise CmdError(f'git cat-file {option} failed: {e}', returncode=1)
+        if not line:
+            self._processes.pop(option, None)
+            raise CmdError(f'git cat-file {option} terminated unexpectedly', returncode=1)
+        
+        fields = line.split(' ')
+        if fields.__len__() != 3:
+            return None
+        return fields[0], fields[1], int(fields[2])
+        
+    def _get_process(self, option):
+        process = self._processes.get(option)
+        if process is not None and process.poll() is None:
+            return process
+        
+        if not self.cwd.exists():
+            raise CmdError('Current working directory not exists.', returncode=1)
+        global _spawn_count
+        _spawn_count += 1
+        process = subprocess.Popen(['git', 'cat-file', option],
+                                   cwd=self.cwd.__str__(),
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+        self._processes[option] = process
+        
+        return process
+    
+    
+class RefReader(object):
+    def __init__(self, git_dir, common_dir=None):
+        self.git_dir = Path(git_dir)
+        self.common_dir = Path(common_dir) if common_dir else self.git_dir
+        self._packed_refs_stat = None
+        self._packed_refs = {}
+        self._lock = threading.Lock()
+        
+    @classmethod
+    def from_work_tree(cls, top_level):
+        git_dir = Path(top_level) / GIT_DIR_NAME
+        if git_dir.is_file():
+            content = git_dir.read_text(encoding='utf-8').strip()
+            if not content.startswith(GIT_DIR_FILE_PREFIX):
+                return None
+            git_dir = (Path(top_level) / content[len(GIT_DIR_FILE_PREFIX):].strip()).resolve()
+        if not git_dir.is_dir():
+            return None
+        
+        common_dir_path = git_dir / 'commondir'
+        common_dir = None
+        if common_dir_path.is_file():
+            common_dir = (git_dir / common_dir_path.read_text(encoding='utf-8').strip()).resolve()
+            
+        return cls(git_dir, common_dir)
+    
+    def list_tags(self):
+        tags = {}
+        for ref, (object_hash, peeled_hash) in self._read_packed_refs().items():
+            if ref.startswith(TAGS_REF_PREFIX):
+                tags[ref[len(TAGS_REF_PREFIX):]] = (object_hash, peeled_hash)
+        
+        tags_path = self.common_dir / TAGS_REF_PREFIX
+        for root, _, files in os.walk(tags_path):
+            for filename in files:
+                object_hash = self._read_loose_ref(Path(root) / filename)
+                if object_hash:
+                    tags[(Path(root) / filename).relative_to(tags_path).as_posix()] = (object_hash, None)
+        
+        return tags
+    
+    def is_any_tag(self):
+        for _, _, files in os.walk(self.common_dir / TAGS_REF_PREFIX):
+            if files:
+                return True
+        
+        with self._map_packed_refs() as packed_refs:
+            return packed_refs is not None and packed_refs.find(f' {TAGS_REF_PREFIX}'.encode('utf-8')) != -1
+    
+    def get_tag(self, tag):
+        object_hash = self._read_loose_ref(self.common_dir / TAGS_REF_PREFIX / tag)
+        if object_hash:
+            return object_hash, None
+        
+        return self._read_packed_refs().get(f'{TAGS_REF_PREFIX}{tag}')
+    
+    def read_loose_object(self, object_hash):
+        object_path = self.common_dir / 'objects' / object_hash[:2] / object_hash[2:]
+        try:
+            raw = zlib.decompress(object_path.read_bytes())
+        except (OSError, zlib.error):
+            return None
+        
+        header, _, data = raw.partition(b'\0')
+        return header.split(b' ', 1)[0].decode('ascii'), data
+    
+    def _read_loose_ref(self, path):
+        try:
+            content = path.read_text(encoding='utf-8').strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+        
+        return content if content.__len__() == HASH_LENGTH else None
+    
+    def _read_packed_refs(self):
+        path = self.common_dir / PACKED_REFS_FILENAME
+        try:
+            stat = path.stat()
+            stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            stat_key = None
+            
+        with self._lock:
+            if stat_key != self._packed_refs_stat:
+                self._packed_refs = self._parse_packed_refs()
+                self._packed_refs_stat = stat_key
+            
+            return self._packed_refs
+    
+    def _parse_packed_refs(self):
+        refs = {}
+        with self._map_packed_refs() as packed_refs:
+            if packed_refs is None:
+                return refs
+            
+            last_ref = None
+            is_fully_peeled = False
+            for line in iter(packed_refs.readline, b''):
+                line = line.rstrip(b'\n')
+                if line.startswith(b'#'):
+                    is_fully_peeled = is_fully_peeled or b' fully-peeled' in line
+                    continue
+                if not line:
+                    continue
+                if line.startswith(b'^'):
+                    if last_ref:
+                        refs[last_ref] = (refs[last_ref][0], line[1:].decode('ascii'))
+                    continue
+                object_hash, _, ref = line.partition(b' ')
+                object_hash = object_hash.decode('ascii')
+                last_ref = ref.decode('utf-8')
+                refs[last_ref] = (object_hash, object_hash if is_fully_peeled else None)
+        
+        return refs
+    
+    @contextlib.contextmanager
+    def _map_packed_refs(self):
+        try:
+            packed_refs_file = open(self.common_dir / PACKED_REFS_FILENAME, 'rb')
+        except OSError:
+            yield None
+            return
+        
+        with packed_refs_file:
+            if os.fstat(packed_refs_file.fileno()).st_size == 0:
+                yield None
+                return
+            with mmap.mmap(packed_refs_file.fileno(), 0, access=mmap.ACCESS_READ) as packed_refs:
+                yield packed_refs
+                
+    
+def get_session(cwd='.'):
+    cwd = Path(cwd).resolve()
+    with _sessions_lock:
+        session = _sessions.get(cwd)
+        if session is None:
+            session = GitSession(cwd)
+            _sessions[cwd] = session
+    
+    return session
+
+
+def get_ref_reader(cwd='.'):
+    cwd = Path(cwd).resolve()
+    top_level = _work_trees.get(cwd)
+    if top_level is None:
+        return None
+    with _sessions_lock:
+        if top_level not in _ref_readers:
+            _ref_readers[top_level] = RefReader.from_work_tree(top_level)
+    
+        return _ref_readers[top_level]
+
+
+@atexit.register
+def close_sessions():
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def clear_work_tree_cache():
+    _work_trees.clear()
+    _ref_readers.clear()
+    close_sessions()
+
+
+def get_spawn_count():
+    return _spawn_count
         
 
 def init(cwd='.'):
+    clear_work_tree_cache()
     return _execute_cmd(['git', 'init'], cwd=cwd)
 
 
 def clone(url, cwd='.'):
+    clear_work_tree_cache()
     return _execute_cmd(['git', 'clone', str(url)], cwd=cwd)
 
 
@@ -113,6 +403,10 @@ def revert(commit_rollback, cwd='.'):
 
 @check_work_tree
 def get_latest_tag(cwd='.'):
+    reader = get_ref_reader(cwd)
+    if reader and not reader.is_any_tag():
+        raise CmdError('fatal: No names found, cannot describe anything.', returncode=128)
+    
     return _execute_cmd(['git', 'describe', '--abbrev=0', '--tags'], cwd=cwd)
 
 
@@ -152,6 +446,9 @@ def set_tag(tag, msg, cwd='.'):
 
 @check_work_tree
 def list_tags(cwd='.'):
+    reader = get_ref_reader(cwd)
+    if reader:
+        return sorted(reader.list_tags())
     return list(filter(None, _execute_cmd(['git', 'tag'], cwd=cwd).split('\n')))
 
 
@@ -166,46 +463,103 @@ def list_repo_tree(cwd='.'):
             raise CmdError(e.__str__(), returncode=1)
     
 
+@check_work_tree
+def list_changed_files(since, cwd='.'):
+    return list(filter(None, _execute_cmd(['git', 'diff', '--name-only', '--diff-filter=ACMR', 
+                                           '--relative', since, '--'], cwd=cwd).split('\n')))
+
+
 @check_work_tree
 def is_any_commit(cwd='.'):
-    try:
-        _execute_cmd(['git', 'log'], cwd=cwd)
-        return True
-    except CmdError:
-        return False    
+    return get_session(cwd).resolve('HEAD^{commit}') is not None
 
 
 @check_work_tree
 def is_any_tag(cwd='.'):
+    reader = get_ref_reader(cwd)
+    if reader:
+        return reader.is_any_tag()
     return list_tags(cwd).__len__() > 0
 
     
 def is_work_tree(cwd='.'):
+    cwd = Path(cwd).resolve()
+    top_level = _work_trees.get(cwd)
+    if top_level is not None and (top_level / GIT_DIR_NAME).exists():
+        return True
+    
+    _work_trees.pop(cwd, None)
     try:
-        if _execute_cmd(['git', 'rev-parse', '--is-inside-work-tree'], cwd=cwd).lower() == 'true':
-            return True
-        else:
-            return False
+        output = _execute_cmd(['git', 'rev-parse', '--is-inside-work-tree', '--show-toplevel'], cwd=cwd).splitlines()
     except CmdError:
         return False
     
+    if output.__len__() != 2 or output[0].lower() != 'true':
+        return False
+    _work_trees[cwd] = Path(output[1])
+    
+    return True
+    
 
 @check_work_tree
-def are_uncommited_changes(cwd='.'):
-    is_normal_changes = _execute_cmd(['git', '--no-pager', 'diff', '--no-ext-diff'], cwd=cwd) != ''
-    is_staged_changes = _execute_cmd(['git', '--no-pager', 'diff', '--no-ext-diff', '--cached'], cwd=cwd) != ''
+def are_uncommited_changes(cwd='.', summary=False):
+    if summary:
+        return get_status_summary(cwd)
+    
+    return _probe_cmd(['git', 'diff', '--quiet', '--no-ext-diff'], cwd=cwd) \
+        or _probe_cmd(['git', 'diff', '--quiet', '--no-ext-diff', '--cached'], cwd=cwd)
     
-    return is_normal_changes or is_staged_changes
     
+@check_work_tree
+def get_status_summary(cwd='.'):
+    staged = []
+    unstaged = []
+    untracked = []
+    conflicted = []
+    
+    entries = _stream_cmd(['git', 'status', '--porcelain', '-z', '--untracked-files=normal'], cwd=cwd)
+    for entry in entries:
+        code, path = entry[:2], entry[3:]
+        if code[0] in 'RC':
+            next(entries, None)
+        if code == '??':
+            untracked.append(path)
+        elif code in STATUS_CONFLICT_CODES:
+            conflicted.append(path)
+        else:
+            if code[0] not in ' !':
+                staged.append(path)
+            if code[1] not in ' !':
+                unstaged.append(path)
+            
+    return StatusSummary(staged, unstaged, untracked, conflicted)
+    
+
+@check_work_tree
+def get_latest_commit_hash(cwd='.', short=True):
+    return _get_commit_hash('HEAD', cwd, short)
+
 
 @check_work_tree
-def get_latest_commit_hash(cwd='.'):
-    return _execute_cmd(["git", "log", "--pretty=format:%h", "-n", "1"], cwd=cwd)
+def get_tree_hash(cwd='.'):
+    tree_hash = get_session(cwd).resolve('HEAD^{tree}')
+    if tree_hash is None:
+        raise CmdError("fatal: ambiguous argument 'HEAD': unknown revision or path not in the working tree.",
+                       returncode=128)
+    
+    return tree_hash
 
 
 @check_work_tree
-def get_tag_commit_hash(tag, cwd='.'):
-    return _execute_cmd(["git", "log", "--pretty=format:%h", "-n", "1", tag], cwd=cwd)
+def get_tag_commit_hash(tag, cwd='.', short=True):
+    reader = get_ref_reader(cwd)
+    tag_ref = reader.get_tag(tag) if reader else None
+    if tag_ref:
+        peeled_tag = _peel_tag(reader, *tag_ref, cwd)
+        if peeled_tag:
+            return get_session(cwd).abbreviate(peeled_tag[0]) if short else peeled_tag[0]
+        
+    return _get_commit_hash(tag, cwd, short)
 
 
 @check_work_tree
@@ -245,6 +599,82 @@ def get_commit_msgs_from_last_tag(cwd='.'):
     return '\n'.join(msg_list) 
 
 
+def _peel_tag(reader, object_hash, peeled_hash, cwd):
+    if peeled_hash:
+        return peeled_hash, peeled_hash != object_hash
+    
+    is_annotated = False
+    while True:
+        obj = reader.read_loose_object(object_hash)
+        if obj is None:
+            obj = get_session(cwd).read_object(object_hash)
+            if obj is None:
+                return None
+            obj = obj[1:]
+        
+        object_type, data = obj
+        if object_type == 'commit':
+            return object_hash, is_annotated
+        if object_type != 'tag':
+            return None
+        
+        is_annotated = True
+        header = data.split(b'\n', 1)[0].decode('ascii')
+        if not header.startswith('object '):
+            return None
+        object_hash = header[len('object '):]
+
+
+def _get_commit_hash(rev, cwd, short=True):
+    session = get_session(cwd)
+    commit_hash = session.resolve(f'{rev}^{{commit}}')
+    if commit_hash is None:
+        raise CmdError(f"fatal: ambiguous argument '{rev}': unknown revision or path not in the working tree.",
+                       returncode=128)
+    
+    return session.abbreviate(commit_hash) if short else commit_hash
+
+
+def _probe_cmd(args, cwd='.'):
+    global _spawn_count
+    _spawn_count += 1
+    try:
+        process = subprocess.run(args,
+                                 cwd=Path(cwd).resolve().__str__(),
+                                 stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE,
+                                 encoding="utf-8")
+    except OSError as e:
+        raise CmdError(e.__str__(), returncode=1)
+    if process.returncode not in (0, 1):
+        raise CmdError(process.stderr, returncode=process.returncode)
+    
+    return process.returncode == 1
+
+
+def _stream_cmd(args, cwd='.'):
+    global _spawn_count
+    _spawn_count += 1
+    try:
+        process = subprocess.Popen(args,
+                                   cwd=Path(cwd).resolve().__str__(),
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+    except OSError as e:
+        raise CmdError(e.__str__(), returncode=1)
+    
+    with process:
+        remainder = b''
+        for data in iter(lambda: process.stdout.read(STATUS_READ_SIZE), b''):
+            *entries, remainder = (remainder + data).split(b'\0')
+            for entry in entries:
+                yield os.fsdecode(entry)
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+    
+    if process.returncode:
+        raise CmdError(stderr, returncode=process.returncode)
+
+
 def _execute_cmd(args, ssh_key=None, cwd='.'):
     cwd = Path(cwd).resolve()
     if not cwd.exists():
@@ -257,6 +687,8 @@ def _execute_cmd(args, ssh_key=None, cwd='.'):
     else:
         env = None
         
+    global _spawn_count
+    _spawn_count += 1
     try:
         process = subprocess.run(args,
                                  check=True,
@@ -4,7 +4,14 @@
 
 import os
 import re
+import sys
+import shutil
+import time
+import hashlib
 import datetime
+import tempfile
+import threading
+import concurrent.futures
 from pathlib import Path
 from pbr import git
 from packaging import version as pkg_version
@@ -17,11 +24,15 @@ from . import pygittools
 from . import wizard
 from . import prepare
 from . import logger
+from . import profiling
 
 
 _logger = logger.get_logger(__name__)
 
 _VERSION_REGEX = r"__version__ *= *['|\"]\S+"
+_CHANGELOG_MARKER = '<!-- Latest release: {} -->\n'
+_CHANGELOG_MARKER_REGEX = r'<!-- Latest release: (\S+) -->\n'
+_CHANGELOG_ENTRY_REGEX = r'^### Version: (\S+) \| Released: '
 
 
 class ReleaseAction(Enum):
@@ -31,32 +42,39 @@ class ReleaseAction(Enum):
 
 def make_install(options=None, cwd='.'):
     _logger.info('Performing installation...')
+    profiler = profiling.PhaseProfiler('install')
     
-    if not options or (options and options.force != 'force'):
-        _check_repo_tree(cwd)
-        _check_if_changes_to_commit(cwd)
+    with profiler.phase('checks'):
+        if not options or (options and options.force != 'force'):
+            _check_repo_tree(cwd)
+            _check_if_changes_to_commit(cwd)
     
-    try:
-        release_tag = pygittools.get_latest_tag(cwd)
-    except pygittools.PygittoolsError as e:
-        raise exceptions.ReleaseMetadataError(f"Retrieving release tag error: {e}", _logger)
-
-    final_release_tag = _get_final_release_tag(release_tag, cwd)
+    with profiler.phase('tag'):
+        try:
+            release_tag = pygittools.get_latest_tag(cwd)
+        except pygittools.PygittoolsError as e:
+            raise exceptions.ReleaseMetadataError(f"Retrieving release tag error: {e}", _logger)
+    
+        final_release_tag = _get_final_release_tag(release_tag, cwd)
     
-    _run_setup_cmd(['install'], release_tag=final_release_tag, cwd=cwd)
+    with profiler.phase('install'):
+        _run_setup_cmd(['install'], release_tag=final_release_tag, cwd=cwd)
     
     _logger.info('Installation completed.')
+    _report_profile(profiler, options)
     
 
 def make_release(action=ReleaseAction.REGENERATE, prompt=True, push=True, release_data=None, options=None, cwd='.'):
     _logger.info('Preparing Source Distribution...')
+    profiler = profiling.PhaseProfiler('release')
     
-    if not options or (options and options.force != 'force'):
-        _check_repo_tree(cwd)
-        _check_if_changes_to_commit(cwd)
+    with profiler.phase('checks'):
+        if not options or (options and options.force != 'force'):
+            _check_repo_tree(cwd)
+            _check_if_changes_to_commit(cwd)
     
-    release_files_paths = []
-    config = utils.get_repo_config_from_setup_cfg(Path(cwd) / settings.FileName.SETUP_CFG)
+        release_files_paths = []
+        config = utils.get_repo_config_from_setup_cfg(Path(cwd) / settings.FileName.SETUP_CFG)
 
     if prompt:
         action = _release_checkout(config)
@@ -70,26 +88,32 @@ def make_release(action=ReleaseAction.REGENERATE, prompt=True, push=True, releas
             
     if action == ReleaseAction.MAKE_RELEASE:
         files_to_add = []
-        files_to_add.append(_update_project_version(config, new_release_tag, cwd))
-        files_to_add.append(_update_changelog(config, new_release_tag, new_release_msg, cwd))
-        files_to_add.append(_update_authors(config, cwd))
+        with profiler.phase('version'):
+            files_to_add.append(_update_project_version(config, new_release_tag, cwd))
+        with profiler.phase('changelog'):
+            files_to_add.append(_update_changelog(config, new_release_tag, new_release_msg, cwd))
+        with profiler.phase('authors'):
+            files_to_add.append(_update_authors(config, cwd))
 
         release_files_paths.extend(_commit_and_push_release_update(new_release_tag, 
                                                                    new_release_msg, 
                                                                    files_to_add=files_to_add, 
                                                                    push=push, 
-                                                                   cwd=cwd))
+                                                                   cwd=cwd,
+                                                                   profiler=profiler))
         release_tag = new_release_tag
         
     elif action == ReleaseAction.REGENERATE:
-        try:
-            release_tag = pygittools.get_latest_tag(cwd)
-        except pygittools.PygittoolsError as e:
-            raise exceptions.ReleaseMetadataError(f"Retrieving release tag error: {e}"
-                                                  f'Repository must be tagged before regenerate.', _logger)
+        with profiler.phase('tag'):
+            try:
+                release_tag = pygittools.get_latest_tag(cwd)
+            except pygittools.PygittoolsError as e:
+                raise exceptions.ReleaseMetadataError(f"Retrieving release tag error: {e}"
+                                                      f'Repository must be tagged before regenerate.', _logger)
 
-    final_release_tag = _get_final_release_tag(release_tag, cwd, action)
-    _run_setup_cmd(['sdist', 'bdist_wheel'], release_tag=final_release_tag, cwd=cwd)
+    with profiler.phase('build') as phase:
+        final_release_tag = _get_final_release_tag(release_tag, cwd, action)
+        phase.details.update(_run_cached_setup_cmd(['sdist', 'bdist_wheel'], release_tag=final_release_tag, cwd=cwd))
     
     package_path = utils.get_latest_tarball(Path(cwd) / settings.DirName.DISTRIBUTION)
     
@@ -98,11 +122,49 @@ def make_release(action=ReleaseAction.REGENERATE, prompt=True, push=True, releas
                                       'Sdidt package name not valid. Please try again.', _logger) 
     
     _logger.info(f'Source Distribution {utils.get_rel_path(package_path, cwd)} prepared properly.')
+    _report_profile(profiler, options)
     
     return package_path
 
 
+def _report_profile(profiler, options):
+    if getattr(options, 'profile', False):
+        profiler.log_report()
+    else:
+        profiler.log_report(_logger.debug)
+    
+    profile_output = getattr(options, 'profile_output', None)
+    if profile_output:
+        profiler.write_report(profile_output)
+
+
 def _run_setup_cmd(cmd, release_tag=None, cwd='.'):
+    setup_path = _prepare_setup_cmd(release_tag, cwd)
+    utils.stream_cmd([settings.Tools.PYTHON, setup_path.__str__()] + cmd, _logger.info, cwd, 
+                     env=_get_setup_cmd_env())
+        
+    
+def _get_setup_cmd_env():
+    return dict(os.environ, PYTHONUNBUFFERED='1')
+
+
+def _run_cached_setup_cmd(cmd, release_tag=None, cwd='.'):
+    cache_key = _get_build_cache_key(cmd, release_tag, cwd)
+    if cache_key and _restore_build(cache_key, cwd):
+        return {'cache': 'hit'}
+    
+    dist_path = Path(cwd).resolve() / settings.DirName.DISTRIBUTION
+    dist_files = _get_dist_files(dist_path)
+    durations = _run_setup_cmds_concurrently(cmd, release_tag=release_tag, cwd=cwd)
+    
+    if cache_key:
+        built_files = [path for path, mtime in _get_dist_files(dist_path).items() if dist_files.get(path) != mtime]
+        _store_build(cache_key, built_files)
+        
+    return durations
+
+
+def _prepare_setup_cmd(release_tag, cwd):
     setup_path = Path(cwd).resolve() / settings.FileName.SETUP_PY
     if not setup_path.exists():
         raise exceptions.FileNotFoundError(f'{utils.get_rel_path(setup_path, cwd)} '
@@ -112,20 +174,144 @@ def _run_setup_cmd(cmd, release_tag=None, cwd='.'):
         os.environ['PBR_VERSION'] = release_tag
     else:
         _logger.info('Release tag will be set by pbr automatically.')
-    result = utils.execute_cmd([settings.Tools.PYTHON, setup_path.__str__()] + cmd, cwd)
-    for line in result.splitlines():
-        _logger.info(line)
         
+    return setup_path
+
+
+def _run_setup_cmds_concurrently(cmds, release_tag=None, cwd='.'):
+    setup_path = _prepare_setup_cmd(release_tag, cwd)
     
+    durations = {}
+    processes = []
+    cancelled = threading.Event()
+    def on_start(process):
+        processes.append(process)
+        if cancelled.is_set():
+            process.kill()
+        
+    with tempfile.TemporaryDirectory(prefix='repoassist_build_') as build_path:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=cmds.__len__())
+        try:
+            futures = {executor.submit(_run_isolated_setup_cmd, setup_path, cmd, 
+                                       Path(build_path) / cmd, on_start, cwd): cmd for cmd in cmds}
+            for future in concurrent.futures.as_completed(futures):
+                cmd = futures[future]
+                try:
+                    duration = future.result()
+                except exceptions.ExecuteCmdError as e:
+                    raise exceptions.ExecuteCmdError(e.returncode, msg=f'{cmd} build failed:\n{e}', logger=_logger)
+                _logger.info(f'{cmd} built in {duration:.2f} s')
+                durations[cmd] = duration
+        finally:
+            cancelled.set()
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+            executor.shutdown()
+            
+    return durations
+                    
+                    
+def _run_isolated_setup_cmd(setup_path, cmd, build_path, on_start, cwd):
+    args = [settings.Tools.PYTHON, setup_path.__str__()]
+    if cmd.startswith('bdist'):
+        build_path.mkdir()
+        args.extend(['egg_info', '--egg-base', build_path.__str__(),
+                     'build', '--build-base', (build_path / 'build').__str__()])
+    args.append(cmd)
+    
+    start_time = time.monotonic()
+    utils.stream_cmd(args, lambda line: _logger.info(f'[{cmd}] {line}'), cwd, 
+                     env=_get_setup_cmd_env(), on_start=on_start)
+    
+    return time.monotonic() - start_time
+
+
+def _get_build_cache_key(cmd, release_tag, cwd):
+    try:
+        status = pygittools.get_status_summary(cwd)
+        if status:
+            _logger.debug('Build cache skipped, there are uncommited changes.')
+            return None
+        if status.untracked:
+            _logger.debug('Build cache skipped, there are untracked files.')
+            return None
+        tree_hash = pygittools.get_tree_hash(cwd)
+        if not release_tag:
+            release_tag = pygittools.get_latest_commit_hash(cwd, short=False)
+    except pygittools.PygittoolsError as e:
+        _logger.debug(f'Build cache skipped: {e}')
+        return None
+    
+    key = '\n'.join([tree_hash, release_tag, sys.version, *cmd])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _get_dist_files(dist_path):
+    if not dist_path.is_dir():
+        return {}
+    return {path: path.stat().st_mtime_ns for path in dist_path.iterdir() if path.is_file()}
+
+
+def _restore_build(cache_key, cwd):
+    entry_path = settings.BUILD_CACHE_PATH / cache_key
+    if not entry_path.is_dir():
+        return False
+    
+    dist_path = Path(cwd).resolve() / settings.DirName.DISTRIBUTION
+    dist_path.mkdir(exist_ok=True)
+    for path in sorted(entry_path.iterdir()):
+        shutil.copyfile(path, dist_path / path.name)
+    os.utime(entry_path)
+    _logger.info(f'Build restored from the cache: {", ".join(path.name for path in sorted(entry_path.iterdir()))}')
+    
+    return True
+
+
+def _store_build(cache_key, built_files):
+    if not built_files:
+        return
+    
+    entry_path = settings.BUILD_CACHE_PATH / cache_key
+    tmp_entry_path = settings.BUILD_CACHE_PATH / f'{cache_key}.tmp'
+    try:
+        shutil.rmtree(tmp_entry_path, ignore_errors=True)
+        tmp_entry_path.mkdir(parents=True)
+        for path in built_files:
+            shutil.copyfile(path, tmp_entry_path / path.name)
+        shutil.rmtree(entry_path, ignore_errors=True)
+        tmp_entry_path.rename(entry_path)
+        _evict_builds(settings.BUILD_CACHE_MAX_SIZE)
+    except OSError as e:
+        shutil.rmtree(tmp_entry_path, ignore_errors=True)
+        _logger.warning(f'Build not cached: {e}')
+
+
+def _evict_builds(max_size):
+    entries = []
+    for entry_path in settings.BUILD_CACHE_PATH.iterdir():
+        if entry_path.is_dir():
+            size = sum(path.stat().st_size for path in entry_path.iterdir())
+            entries.append((entry_path.stat().st_mtime, size, entry_path))
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(entry_path, ignore_errors=True)
+        total_size -= size
+        _logger.debug(f'Build cache entry {entry_path.name} evicted.')
+        
+
 def _get_final_release_tag(release_tag, cwd, action=None):
     if not action or (action == ReleaseAction.REGENERATE):
         try:
-            tag_commit_hash = pygittools.get_tag_commit_hash(release_tag, cwd)
+            tag_commit_hash = pygittools.get_tag_commit_hash(release_tag, cwd, short=False)
         except pygittools.PygittoolsError as e:
             raise exceptions.ReleaseMetadataError(f'Retrieving tag commit hash error: {e}', _logger)
         
         try:
-            latest_commit_hash = pygittools.get_latest_commit_hash(cwd)
+            latest_commit_hash = pygittools.get_latest_commit_hash(cwd, short=False)
         except pygittools.PygittoolsError as e:
             raise exceptions.ReleaseMetadataError(f'Retrieving latest commit hash error: {e}', _logger)
             
@@ -140,7 +326,10 @@ def _get_final_release_tag(release_tag, cwd, action=None):
 def _check_if_changes_to_commit(cwd):
     try:
         if pygittools.are_uncommited_changes(cwd):
-            raise exceptions.UncommitedChangesError('There are changes to commit!', _logger)
+            summary = pygittools.get_status_summary(cwd)
+            raise exceptions.UncommitedChangesError(f'There are changes to commit! Staged: {summary.staged.__len__()}, '
+                                                    f'unstaged: {summary.unstaged.__len__()}, '
+                                                    f'conflicted: {summary.conflicted.__len__()}.', _logger)
     except pygittools.PygittoolsError:
         raise exceptions.UncommitedChangesError('Error checking if there are any changes to commit!', _logger)
     
@@ -227,6 +416,44 @@ def _update_generated_changelog(config, new_release_tag, new_release_msg, cwd='.
     _logger.info(f'Updating {settings.FileName.CHANGELOG} file...')
     
     changelog_path = Path(cwd).resolve() / settings.FileName.CHANGELOG
+    if not _insert_changelog_entry(changelog_path, new_release_tag, new_release_msg, cwd):
+        _rebuild_generated_changelog(config, changelog_path, new_release_tag, new_release_msg, cwd)
+    
+    _logger.info(f'{settings.FileName.CHANGELOG} file updated')    
+    
+    return changelog_path
+
+
+def _insert_changelog_entry(changelog_path, new_release_tag, new_release_msg, cwd='.'):
+    try:
+        with open(changelog_path, newline='') as file:
+            changelog = file.read()
+    except FileNotFoundError:
+        return False
+    
+    marker = re.search(_CHANGELOG_MARKER_REGEX, changelog)
+    if not marker:
+        _logger.debug(f'Latest release marker not found in {settings.FileName.CHANGELOG}, rebuilding.')
+        return False
+    
+    try:
+        tags = set(pygittools.list_tags(cwd))
+    except pygittools.PygittoolsError as e:
+        raise exceptions.ChangelogGenerateError(f'Changelog generation error: {e}', _logger)
+    if marker.group(1) not in tags or set(re.findall(_CHANGELOG_ENTRY_REGEX, changelog, re.MULTILINE)) != tags:
+        _logger.debug(f'{settings.FileName.CHANGELOG} does not match the repository tags, rebuilding.')
+        return False
+    
+    with open(changelog_path, 'w', newline='') as file:
+        file.write(changelog[:marker.start()])
+        file.write(_CHANGELOG_MARKER.format(new_release_tag))
+        file.write(_get_changelog_entry(new_release_tag, new_release_msg))
+        file.write(changelog[marker.end():])
+        
+    return True
+    
+    
+def _rebuild_generated_changelog(config, changelog_path, new_release_tag, new_release_msg, cwd='.'):
     try:
         changelog_content = pygittools.get_changelog(
             report_format='### Version: %(tag) | Released: %(taggerdate:short) \r\n%(contents)', cwd=cwd)
@@ -239,12 +466,9 @@ def _update_generated_changelog(config, new_release_tag, new_release_msg, cwd='.
                                      changelog_path, config.__dict__, cwd, verbose=False)
     with open(changelog_path, 'a') as file:
         file.write('\n')
+        file.write(_CHANGELOG_MARKER.format(new_release_tag))
         file.write(_get_changelog_entry(new_release_tag, new_release_msg))
         file.write(changelog_content)
-    
-    _logger.info(f'{settings.FileName.CHANGELOG} file updated')    
-    
-    return changelog_path
 
 
 def _get_changelog_entry(release_tag, release_msg):
@@ -253,58 +477,63 @@ def _get_changelog_entry(release_tag, release_msg):
     return f'### Version: {release_tag} | Released: {tagger_date} \n{release_msg}\n\n'
 
 
-def _commit_and_push_release_update(new_release_tag, new_release_msg, files_to_add=None, push=True, cwd='.', debug=None):
+def _commit_and_push_release_update(new_release_tag, new_release_msg, files_to_add=None, push=True, cwd='.', debug=None, 
+                                    profiler=None):
+    profiler = profiler or profiling.PhaseProfiler('release')
     if push:
         _logger.info('Commit updated release files, set tag and push...')
     else:
         _logger.info('Commit updated release files, set tag...')
     
-    paths = []
-    for file_path in files_to_add:
+    with profiler.phase('commit'):
+        paths = []
+        for file_path in files_to_add:
+            try:
+                pygittools.add(file_path, cwd)
+            except pygittools.PygittoolsError as e:
+                raise exceptions.CommitAndPushReleaseUpdateError(f'{file_path.name} git add error: {e}', _logger)
+            paths.append(file_path)
+        
         try:
-            pygittools.add(file_path, cwd)
+            pygittools.commit(settings.AUTOMATIC_RELEASE_COMMIT_MSG, cwd)
         except pygittools.PygittoolsError as e:
-            raise exceptions.CommitAndPushReleaseUpdateError(f'{file_path.name} git add error: {e}', _logger)
-        paths.append(file_path)
+            raise exceptions.CommitAndPushReleaseUpdateError(f"git commit error: {e}", _logger)
+        _logger.info('New commit with updated release files created.')
     
-    try:
-        pygittools.commit(settings.AUTOMATIC_RELEASE_COMMIT_MSG, cwd)
-    except pygittools.PygittoolsError as e:
-        raise exceptions.CommitAndPushReleaseUpdateError(f"git commit error: {e}", _logger)
-    _logger.info('New commit with updated release files created.')
-    
-    try:
-        pygittools.set_tag(new_release_tag, new_release_msg, cwd)
-        if debug:
-            raise pygittools.PygittoolsError('Error for debug', returncode=1)
-    except pygittools.PygittoolsError as e:
-        _clean_failed_release(new_release_tag, cwd)
-        raise exceptions.ReleaseTagSetError(f"Error while setting release tag: {e}", _logger)
-    
-    try:
-        new_latest_tag = pygittools.get_latest_tag(cwd)
-    except pygittools.PygittoolsError as e:
-        _clean_failed_release(new_release_tag, cwd)
-        raise exceptions.ReleaseTagSetError(f"Error while check if the new release tag set properly: {e}", _logger)
-    else:
-        if new_latest_tag != new_release_tag:
+    with profiler.phase('tag'):
+        try:
+            pygittools.set_tag(new_release_tag, new_release_msg, cwd)
+            if debug:
+                raise pygittools.PygittoolsError('Error for debug', returncode=1)
+        except pygittools.PygittoolsError as e:
             _clean_failed_release(new_release_tag, cwd)
-            raise exceptions.ReleaseTagSetError('New release tag was set incorrectly.', _logger)
-    
-    _logger.info('New tag established.')
-    
-    if push and pygittools.is_origin_set(cwd):
+            raise exceptions.ReleaseTagSetError(f"Error while setting release tag: {e}", _logger)
+        
         try:
-            pygittools.push_with_tags(cwd)
+            new_latest_tag = pygittools.get_latest_tag(cwd)
         except pygittools.PygittoolsError as e:
-            _logger.error(f"git push error: {e}")
-            _logger.info('!!!IMPORTANT!!! Please check repository origin or credentials and push changes WITH TAGS manually! '
-                         'Releasing process is continued.')
-            _logger.info('New release data commited with tag set properly.')
+            _clean_failed_release(new_release_tag, cwd)
+            raise exceptions.ReleaseTagSetError(f"Error while check if the new release tag set properly: {e}", _logger)
         else:
-            _logger.info('New release data commited with tag set and pushed properly.')
-    else:
-        _logger.info('New release data commited with tag set properly.')
+            if new_latest_tag != new_release_tag:
+                _clean_failed_release(new_release_tag, cwd)
+                raise exceptions.ReleaseTagSetError('New release tag was set incorrectly.', _logger)
+        
+        _logger.info('New tag established.')
+    
+    with profiler.phase('push'):
+        if push and pygittools.is_origin_set(cwd):
+            try:
+                pygittools.push_with_tags(cwd)
+            except pygittools.PygittoolsError as e:
+                _logger.error(f"git push error: {e}")
+                _logger.info('!!!IMPORTANT!!! Please check repository origin or credentials and push changes WITH TAGS manually! '
+                             'Releasing process is continued.')
+                _logger.info('New release data commited with tag set properly.')
+            else:
+                _logger.info('New release data commited with tag set and pushed properly.')
+        else:
+            _logger.info('New release data commited with tag set properly.')
     
     return paths
 
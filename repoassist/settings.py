@@ -65,6 +65,14 @@ LICENSE = 'MIT'
 RELEASE_PACKAGE_SUFFIX = '_release'
 JINJA2_TEMPLATE_EXT = '.j2'
 TARBALL_SUFFIX = '.tar'
+BUILD_CACHE_PATH = Path.home() / '.cache' / 'repoassist' / 'builds'
+BUILD_CACHE_MAX_SIZE = 512 * 1024 * 1024
+TEMPLATES_CACHE_PATH = Path.home() / '.cache' / 'repoassist' / 'templates'
+IMPORTS_CACHE_PATH = Path.home() / '.cache' / 'repoassist' / 'imports.json'
+IMPORTS_POOL_MIN_FILES = 64
+FORMATTER_CACHE_PATH = Path.home() / '.cache' / 'repoassist' / 'formatter.json'
+FORMATTER_CACHE_MAX_ENTRIES = 10000
+CMD_OUTPUT_TAIL_LINES = 200
 
 ENTRY_POINT_PLACEHOLDER = '<project_name>'
 MODULE_ENTRY_POINT = f'{ENTRY_POINT_PLACEHOLDER} = {ENTRY_POINT_PLACEHOLDER}:main'
@@ -108,6 +116,7 @@ class FileName():
     FORMATTER = 'formatter.py'
     PREPARE = 'prepare.py'
     CLEAN = 'clean.py'
+    PROFILING = 'profiling.py'
     CLOUD_CREDENTIALS = 'cloud_credentials.txt'
     REQUIREMENTS = 'requirements.txt'
     REQUIREMENTS_DEV = 'requirements-dev.txt'
@@ -246,6 +255,7 @@ REPOASSIST_FILES = [
     RepoassistFileGenEntry(src=Path(FileName.FORMATTER), dst=Path('.') / DirName.REPOASSIST / FileName.FORMATTER, is_templ=False),
     RepoassistFileGenEntry(src=Path(FileName.PREPARE), dst=Path('.') / DirName.REPOASSIST / FileName.PREPARE, is_templ=False),
     RepoassistFileGenEntry(src=Path(FileName.CLEAN), dst=Path('.') / DirName.REPOASSIST / FileName.CLEAN, is_templ=False),
+    RepoassistFileGenEntry(src=Path(FileName.PROFILING), dst=Path('.') / DirName.REPOASSIST / FileName.PROFILING, is_templ=False),
     RepoassistFileGenEntry(src=Path(FileName.REPOASSIST_CLI), dst=Path('.') / DirName.REPOASSIST / FileName.CLI, is_templ=False),
     RepoassistFileGenEntry(src=Path(DirName.TEMPLATES) / f'{FileName.CHANGELOG_GENERATED}{JINJA2_TEMPLATE_EXT}', 
                            dst=Path('.') / DirName.REPOASSIST / DirName.TEMPLATES / f'{FileName.CHANGELOG_GENERATED}{JINJA2_TEMPLATE_EXT}', 
@@ -286,4 +296,26 @@ DIRS_TO_CLEAN = [
     {'name': 'htmlcov', 'flag': '.'},
 ]
 
+# Never searched while cleaning, unless matched above
+DIRS_TO_SKIP_WHILE_CLEANING = [
+    '.git',
+    '.hg',
+    '.svn',
+    '.venv',
+    'venv*',
+    'node_modules',
+]
+
+CLEAN_WORKERS = 8
+
 DEFAULT_REQUIREMENTS = ['setuptools']
+
+DIRS_TO_SKIP_WHILE_COLLECTING_REQS = [
+    '.hg',
+    '.svn',
+    '.git',
+    '.tox',
+    '__pycache__',
+    'env',
+    'venv',
+]
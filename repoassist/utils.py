@@ -7,7 +7,7 @@ import configparser
 import platform
 import tempfile
 from pathlib import Path
-from collections import namedtuple
+from collections import namedtuple, deque
 
 from . import pygittools
 from . import settings
@@ -16,9 +16,16 @@ from . import logger
 
 
 _logger = logger.get_logger(__name__)
+_spawn_count = 0
+
+
+def get_spawn_count():
+    return _spawn_count
 
 
 def execute_cmd(args, cwd='.'):
+    global _spawn_count
+    _spawn_count += 1
     try:
         p = subprocess.run(args,
                            check=True,
@@ -32,7 +39,32 @@ def execute_cmd(args, cwd='.'):
         return p.stdout
 
 
+def stream_cmd(args, line_handler=None, cwd='.', env=None, on_start=None):
+    global _spawn_count
+    _spawn_count += 1
+    tail = deque(maxlen=settings.CMD_OUTPUT_TAIL_LINES)
+    with subprocess.Popen(args,
+                          cwd=str(cwd),
+                          env=env,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT,
+                          encoding='utf-8',
+                          errors='replace') as p:
+        if on_start:
+            on_start(p)
+        for line in p.stdout:
+            line = line.rstrip('\r\n')
+            tail.append(line)
+            if line_handler:
+                line_handler(line)
+            
+    if p.returncode:
+        raise exceptions.ExecuteCmdError(p.returncode, msg='\n'.join(tail), logger=_logger)
+
+
 def execute_cmd_and_split_lines_to_list(args, cwd='.'):
+    global _spawn_count
+    _spawn_count += 1
     try:
         p = subprocess.run(args,
                            check=True,
@@ -2,15 +2,36 @@
 # -*- coding: utf-8 -*-
 
 
-import jinja2
+import io
+import os
+import sys
+import ssl
+import json
+import time
+import copy
+import random
+import enum
+import shlex
+import socket
+import tarfile
+import queue
 import ftplib
+import hashlib
 import inspect
+import atexit
 import logging
+import logging.handlers
+import argparse
 import datetime
+import threading
+import functools
+import contextlib
 import configparser
+import socketserver
 import dataclasses
+import concurrent.futures
 from pathlib import Path
-from collections import namedtuple
+from collections import namedtuple, deque, OrderedDict
 from types import SimpleNamespace
 
 
@@ -33,6 +54,36 @@ project_name = {{project_name}}
 """
 
 FTP_ERR_CODE_FILE_UNAVAILABLE = 550
+FTP_TIME_FORMAT = '%Y%m%d%H%M%S'
+# Greeting, USER, PASS and QUIT
+FTP_SESSION_ROUND_TRIPS = 4
+# TYPE, PASV and the transfer command itself
+FTP_TRANSFER_ROUND_TRIPS = 3
+SYNC_WORKERS = 4
+CHUNK_WORKERS = 4
+CHUNKS_DIR_PREFIX = '.'
+CHUNKS_DIR_SUFFIX = '.chunks'
+CHUNKS_MANIFEST_FILENAME = 'manifest.json'
+CHECKSUM_FILE_SUFFIX = '.sha256'
+BUNDLE_SUFFIX = '.tar'
+BUNDLE_INDEX_SUFFIX = '.index.json'
+BUNDLE_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+HASH_BLOCK_SIZE = 1024 * 1024
+SESSION_POOL_MAX_IDLE = 8
+SESSION_POOL_IDLE_TIMEOUT = 60
+AGENT_WORKERS = 4
+AGENT_LISTING_TTL = 30
+CONCURRENCY_INITIAL_LIMIT = 2
+CONCURRENCY_GAIN_THRESHOLD = 1.1
+CONCURRENCY_MAX_BACKOFFS = 5
+CONCURRENCY_POLL_INTERVAL = 0.1
+# Too many connections, can't open data connection, connection closed
+CONCURRENCY_BACKOFF_CODES = ['421', '425', '426']
+CACHE_DIR_PATH = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'sicloudman'
+CONCURRENCY_LIMITS_CACHE_PATH = CACHE_DIR_PATH / 'concurrency_limits.json'
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
 
 
 class SiCloudManError(Exception):
@@ -73,6 +124,18 @@ class FtpError(SiCloudManError):
     pass
 
 
+class MirrorError(SiCloudManError):
+    pass
+
+
+class ChecksumError(SiCloudManError):
+    pass
+
+
+class AgentError(SiCloudManError):
+    pass
+
+
 def handle_ftplib_error(func):
     def wrapper(*args, **kwargs):
         try:
@@ -82,7 +145,7 @@ def handle_ftplib_error(func):
             arg_names = list(sign.parameters.keys())
             passed = {k: v for k, v in zip(arg_names[:len(args)], args)}
             self = passed['self']
-            raise FtpError(f'Ftp error occured: {e}', self._logger)
+            raise FtpError(f'Ftp error occured: {e}', self._logger) from e
 
     return wrapper
 
@@ -108,6 +171,9 @@ class Credentials(object):
     main_bucket_path: str
     client_name: str = ''
     project_name: str = ''
+    port: str = ''
+    use_tls: str = ''
+    tls_cafile: str = ''
 
     @staticmethod
     def get_fields():
@@ -118,14 +184,308 @@ class Credentials(object):
         return dir(Credentials)
 
 
-Bucket = namedtuple('Bucket', 'name keywords')
+class _ReusedSessionFTP_TLS(ftplib.FTP_TLS):
+    def __init__(self, *args, session=None, **kwargs):
+        self.session = session
+        super().__init__(*args, **kwargs)
+
+    def auth(self):
+        resp = self.voidcmd('AUTH TLS')
+        self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host, session=self.session)
+        self.file = self.sock.makefile(mode='r', encoding=self.encoding)
+        return resp
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=self.sock.session)
+        return conn, size
+
+
+Bucket = namedtuple('Bucket', 'name keywords bundle', defaults=(False,))
+BundleMember = namedtuple('BundleMember', 'archive_name name offset size mtime sha256')
+FileEntry = namedtuple('FileEntry', 'path size mtime')
+Transfer = namedtuple('Transfer', 'bucket_name local_path size mtime')
+ChunkPart = namedtuple('ChunkPart', 'chunks_dir name offset size local_path sha256', defaults=(None,))
+
+
+class _FileSlice(object):
+    def __init__(self, file, offset, size):
+        file.seek(offset)
+        self._file = file
+        self._remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+class _HashingReader(object):
+    def __init__(self, file, on_eof=None):
+        self._file = file
+        self._on_eof = on_eof
+        self.hash = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        if not data and self._on_eof:
+            self._on_eof()
+        self.hash.update(data)
+        self.bytes_read += len(data)
+        return data
+
+    def skip(self, size):
+        while size > 0:
+            size -= len(self.read(min(size, HASH_BLOCK_SIZE)))
+
+
+class _HashingWriter(object):
+    def __init__(self, write):
+        self._write = write
+        self.hash = hashlib.sha256()
+
+    def __call__(self, data):
+        self.hash.update(data)
+        self._write(data)
+
+
+@dataclasses.dataclass
+class UploadPlan(object):
+    transfers: list = dataclasses.field(default_factory=list)
+    retries: int = 0
+
+    @property
+    def bytes_total(self):
+        return sum(transfer.size for transfer in self.transfers)
+
+    @property
+    def buckets(self):
+        return list(dict.fromkeys(transfer.bucket_name for transfer in self.transfers))
+
+    def get_bucket_transfers(self, bucket_name):
+        return [transfer for transfer in self.transfers if transfer.bucket_name == bucket_name]
+
+
+class MirrorPolicy(enum.Enum):
+    ALL = 'all'
+    QUORUM = 'quorum'
+
+
+DestinationResult = namedtuple('DestinationResult', 'credentials uploaded_files error')
+
+
+@dataclasses.dataclass
+class MirrorReport(object):
+    results: list = dataclasses.field(default_factory=list)
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.error is None]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.error is not None]
+
+    def is_policy_met(self, policy):
+        if policy == MirrorPolicy.ALL:
+            return not self.failed
+        else:
+            return len(self.succeeded) > len(self.results) // 2
+
+
+@dataclasses.dataclass
+class SyncSummary(object):
+    transferred: list = dataclasses.field(default_factory=list)
+    skipped: list = dataclasses.field(default_factory=list)
+    bytes_transferred: int = 0
+    bytes_total: int = 0
+    retries: int = 0
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_total - self.bytes_transferred
+
+
+class ConcurrencyController(object):
+    _logger = logging.getLogger(__name__)
+    _learned_limits_lock = threading.Lock()
+
+    def __init__(self, key, max_limit, initial_limit=CONCURRENCY_INITIAL_LIMIT):
+        self.key = key
+        self.max_limit = max(1, max_limit)
+        learned_limit = ConcurrencyController.get_learned_limit(key)
+        if learned_limit is None:
+            learned_limit = initial_limit
+        self.limit = min(self.max_limit, learned_limit)
+        self.running = 0
+        self.backoffs = 0
+        self.consecutive_backoffs = 0
+        self._best_throughput = 0.0
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    @classmethod
+    def get_learned_limit(cls, key):
+        with cls._learned_limits_lock:
+            return cls._load_learned_limits().get(cls._get_host_key(key))
+
+    @classmethod
+    def forget_learned_limits(cls):
+        with cls._learned_limits_lock:
+            if CONCURRENCY_LIMITS_CACHE_PATH.exists():
+                CONCURRENCY_LIMITS_CACHE_PATH.unlink()
+
+    @staticmethod
+    def _get_host_key(key):
+        return ':'.join(key)
+
+    @classmethod
+    def _load_learned_limits(cls):
+        if not CONCURRENCY_LIMITS_CACHE_PATH.exists():
+            return {}
+        try:
+            with open(CONCURRENCY_LIMITS_CACHE_PATH) as file:
+                learned_limits = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            cls._logger.debug(f'Concurrency limits cache {CONCURRENCY_LIMITS_CACHE_PATH} not read: {e}')
+            return {}
+
+        return learned_limits if isinstance(learned_limits, dict) else {}
+
+    @classmethod
+    def _save_learned_limit(cls, key, limit):
+        learned_limits = cls._load_learned_limits()
+        if learned_limits.get(cls._get_host_key(key)) == limit:
+            return
+        learned_limits[cls._get_host_key(key)] = limit
+        tmp_path = CONCURRENCY_LIMITS_CACHE_PATH.with_name(f'{CONCURRENCY_LIMITS_CACHE_PATH.name}.{os.getpid()}.tmp')
+        try:
+            CONCURRENCY_LIMITS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as file:
+                json.dump(learned_limits, file, indent=4)
+            os.replace(tmp_path, CONCURRENCY_LIMITS_CACHE_PATH)
+        except OSError as e:
+            cls._logger.debug(f'Concurrency limits cache {CONCURRENCY_LIMITS_CACHE_PATH} not written: {e}')
+
+    @staticmethod
+    def is_backoff_error(error):
+        if isinstance(error, ftplib.error_temp):
+            return str(error)[:3] in CONCURRENCY_BACKOFF_CODES
+        return isinstance(error, (socket.timeout, TimeoutError, ConnectionError, EOFError))
+
+    def acquire(self):
+        with self._lock:
+            if self.running < self.limit:
+                self.running += 1
+                return True
+            return False
+
+    def release(self):
+        with self._lock:
+            self.running -= 1
+
+    def release_if_over_limit(self):
+        with self._lock:
+            if self.running > self.limit:
+                self.running -= 1
+                return True
+            return False
+
+    def record_success(self, size):
+        with self._lock:
+            self.consecutive_backoffs = 0
+            self._window_bytes += size
+            self._window_transfers += 1
+            if self._window_transfers < self.limit:
+                return
+
+            elapsed = time.monotonic() - self._window_started
+            throughput = self._window_bytes / elapsed if elapsed > 0 else float('inf')
+            if throughput > self._best_throughput * CONCURRENCY_GAIN_THRESHOLD:
+                self._best_throughput = throughput
+                self.limit = min(self.max_limit, self.limit + 1)
+            self._reset_window()
+            self._remember()
+
+    def record_backoff(self):
+        with self._lock:
+            self.backoffs += 1
+            self.consecutive_backoffs += 1
+            self.limit = max(1, self.limit // 2)
+            self._best_throughput = 0.0
+            self._reset_window()
+            self._remember()
+
+            return self.consecutive_backoffs <= CONCURRENCY_MAX_BACKOFFS
+
+    def _reset_window(self):
+        self._window_bytes = 0
+        self._window_transfers = 0
+        self._window_started = time.monotonic()
+
+    def _remember(self):
+        with ConcurrencyController._learned_limits_lock:
+            ConcurrencyController._save_learned_limit(self.key, self.limit)
+
+
+_queue_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry)
+
+
+def enable_queue_logging(logger=None, json_format=False):
+    logger = logger or logging.getLogger()
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, logging.handlers.QueueHandler)]
+    if not handlers:
+        return None
+    if json_format:
+        for handler in handlers:
+            handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    _queue_listeners.append((logger, queue_handler, listener))
+
+    return listener
+
+
+@atexit.register
+def disable_queue_logging():
+    while _queue_listeners:
+        logger, queue_handler, listener = _queue_listeners.pop()
+        logger.removeHandler(queue_handler)
+        listener.stop()
+        for handler in listener.handlers:
+            logger.addHandler(handler)
 
 
 class CloudManager(object):
     _logger = logging.getLogger(__name__)
+    _metrics_lock = threading.Lock()
 
     def __init__(self, artifacts_path, buckets_list, credentials=None,
-                 credentials_path=None, get_logger=None, cwd='.'):
+                 credentials_path=None, get_logger=None, cwd='.', mirror_policy=None, chunk_size=None):
         if not isinstance(buckets_list, list):
             raise TypeError('buckets_list parameter must be a list!', self._logger)
         self.cwd = Path(cwd)
@@ -137,56 +497,135 @@ class CloudManager(object):
         else:
             self.credentials_path = self.cwd / CLOUD_CREDENTIALS_FILENAME
         self.buckets_list = buckets_list
+        self.chunk_size = chunk_size
         if get_logger:
             CloudManager._logger = get_logger(__name__)
 
+        self.mirror_policy = MirrorPolicy.ALL if mirror_policy is None else MirrorPolicy(mirror_policy)
+
+        self._tls_sessions = {}
+        self._started_uploads = {}
+        self.session_pool = None
+        self.mirrors = []
+        self.mirror_report = None
         if credentials:
-            if isinstance(credentials, Credentials):
-                self.credentials = credentials
-            else:
-                raise TypeError('credentials parameter is not an instance of Credentials class', self._logger)
+            if isinstance(credentials, list):
+                credentials, *self.mirrors = credentials
+            for item in [credentials] + self.mirrors:
+                if not isinstance(item, Credentials):
+                    raise TypeError('credentials parameter is not an instance of Credentials class', self._logger)
+            self.credentials = credentials
         else:
             self.credentials = None
 
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_credentials_template():
+        import jinja2
+
+        return jinja2.Environment(loader=jinja2.BaseLoader).from_string(CLOUD_CREDENTIALS_FILE_TEMPLATE)
+
+    @property
+    def destinations(self):
+        return [self.credentials] + self.mirrors
+
     @staticmethod
     def touch_credentials(path, keywords={}):
         file_path = Path(path) / CLOUD_CREDENTIALS_FILENAME
-        rtemplate = jinja2.Environment(loader=jinja2.BaseLoader).from_string(CLOUD_CREDENTIALS_FILE_TEMPLATE)
-        final_content = rtemplate.render(keywords)
+        final_content = CloudManager._get_credentials_template().render(keywords)
         file_path.write_text(final_content, 'utf-8')
 
         return file_path
 
     @check_credentials
     @handle_ftplib_error
-    def upload_artifacts(self, prompt=True):
+    def upload_artifacts(self, prompt=True, dry_run=False):
         self._logger.info('Upload files to the cloud server...')
-        uploaded_files = []
 
-        with ftplib.FTP(self.credentials.server,
-                        self.credentials.username,
-                        self.credentials.password) as ftp_conn:
-            for bucket in self.buckets_list:
-                files_to_upload = []
-                for keyword in bucket.keywords:
-                    file = self.get_latest_file_with_keyword(self.artifacts_path, keyword)
-                    if file:
-                        files_to_upload.append(file)
-
-                for file in files_to_upload:
-                    if prompt:
-                        if not self._is_checkpoint_ok(__name__, f'Upload the {file} file?'):
-                            file = None
-
-                    if file:
-                        self._create_buckets_tree(ftp_conn)
-                        self._upload_file_to_bucket(ftp_conn, file, bucket.name)
-                        uploaded_files.append((Path(ftp_conn.pwd()) / file.name).as_posix())
-
-        if not uploaded_files:
+        plan = self.plan_artifacts(prompt)
+        if not plan.transfers:
             self._logger.info('No files to upload.')
+            return []
 
-        return uploaded_files
+        self._log_upload_plan(plan)
+        if dry_run:
+            return [self._get_remote_file_path(transfer) for transfer in plan.transfers]
+
+        if self.mirrors:
+            return self._mirror_primary_plan(plan)
+
+        return self.execute_plan(plan)
+
+    def plan_artifacts(self, prompt=True):
+        plan = UploadPlan()
+        for bucket in self.buckets_list:
+            if bucket.bundle:
+                plan.transfers.extend(self._plan_bundle(bucket, prompt))
+                continue
+
+            files_to_upload = []
+            for keyword in bucket.keywords:
+                file = self.get_latest_file_with_keyword(self.artifacts_path, keyword)
+                if file and file not in files_to_upload:
+                    files_to_upload.append(file)
+
+            for file in files_to_upload:
+                if prompt:
+                    if not self._is_checkpoint_ok(__name__, f'Upload the {file} file?'):
+                        continue
+
+                file_entry = self._get_local_file_entry(file)
+                plan.transfers.append(Transfer(bucket_name=bucket.name, local_path=file,
+                                               size=file_entry.size, mtime=file_entry.mtime))
+
+        return plan
+
+    def _plan_bundle(self, bucket, prompt):
+        file_entries = sorted(self._get_local_bucket_files(bucket).values())
+        if file_entries and prompt:
+            if not self._is_checkpoint_ok(__name__, f'Upload {len(file_entries)} files bundled '
+                                                    f'to the {bucket.name} bucket?'):
+                return []
+
+        return [Transfer(bucket_name=bucket.name, local_path=entry.path, size=entry.size, mtime=entry.mtime)
+                for entry in file_entries]
+
+    @check_credentials
+    @handle_ftplib_error
+    def execute_plan(self, plan):
+        with self._connect() as ftp_conn:
+            return self._execute_upload_plan(ftp_conn, plan)
+
+    @check_credentials
+    def mirror_plan(self, plan, policy=None):
+        policy = self.mirror_policy if policy is None else MirrorPolicy(policy)
+        destinations = self.destinations
+        self._logger.info(f'Mirror {len(plan.transfers)} files to {len(destinations)} destinations...')
+
+        def upload_to_destination(credentials):
+            destination_manager = copy.copy(self)
+            destination_manager.credentials = credentials
+            destination_manager.mirrors = []
+            try:
+                return DestinationResult(credentials, destination_manager.execute_plan(plan), None)
+            except SiCloudManError as e:
+                return DestinationResult(credentials, [], e)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(destinations)) as executor:
+            report = MirrorReport(list(executor.map(upload_to_destination, destinations)))
+
+        for result in report.results:
+            if result.error is None:
+                self._logger.info(f'Destination {result.credentials.server}: '
+                                  f'{len(result.uploaded_files)} files uploaded.')
+            else:
+                self._logger.error(f'Destination {result.credentials.server}: {result.error}')
+
+        if not report.is_policy_met(policy):
+            raise MirrorError(f'Mirroring failed for {len(report.failed)} of {len(report.results)} destinations '
+                              f'with the {policy.value} policy!', self._logger)
+
+        return report
 
     @check_credentials
     @handle_ftplib_error
@@ -210,22 +649,26 @@ class CloudManager(object):
         if bucket_name not in available_buckets:
             raise BucketNotFoundError(f'Bucket {file_path} not found on the cloud server!', self._logger)
 
-        with ftplib.FTP(self.credentials.server,
-                        self.credentials.username,
-                        self.credentials.password) as ftp_conn:
-            self._create_buckets_tree(ftp_conn)
-            self._upload_file_to_bucket(ftp_conn, file_path, bucket_name)
+        file_entry = self._get_local_file_entry(file_path)
+        plan = UploadPlan([Transfer(bucket_name=bucket_name, local_path=file_path,
+                                    size=file_entry.size, mtime=file_entry.mtime)])
+        if self.mirrors:
+            uploaded_files = self._mirror_primary_plan(plan)
+            return uploaded_files[0] if uploaded_files else None
+
+        with self._connect() as ftp_conn:
+            return self._execute_upload_plan(ftp_conn, plan)[0]
 
-            return (Path(ftp_conn.pwd()) / file_path.name).as_posix()
+    def _mirror_primary_plan(self, plan):
+        self.mirror_report = self.mirror_plan(plan)
+        return self.mirror_report.results[0].uploaded_files
 
     @check_credentials
     @handle_ftplib_error
     def list_cloud(self):
         self._logger.info('List cloud buckets...')
 
-        with ftplib.FTP(self.credentials.server,
-                        self.credentials.username,
-                        self.credentials.password) as ftp_conn:
+        with self._connect() as ftp_conn:
             project_bucket_path = self._get_project_bucket_path()
             if not self._is_path_exists(ftp_conn, project_bucket_path):
                 self._logger.info('There are no buckets on the cloud server.')
@@ -251,15 +694,15 @@ class CloudManager(object):
         if bucket_name is None:
             raise FileNotFoundError('File not found on the cloud server. Bucket not found!', self._logger)
 
-        with ftplib.FTP(self.credentials.server,
-                        self.credentials.username,
-                        self.credentials.password) as ftp_conn:
+        with self._connect() as ftp_conn:
             file_dir = self._get_project_bucket_path() / bucket_name
             if not self._is_path_exists(ftp_conn, file_dir):
                 raise FileNotFoundError('File not found on the cloud server!', self._logger)
 
             ftp_conn.cwd(file_dir.as_posix())
-            if filename not in ftp_conn.nlst():
+            bucket_contents = ftp_conn.nlst()
+            manifest, bundle_member = self._locate_remote_file(ftp_conn, bucket_contents, filename)
+            if filename not in bucket_contents and manifest is None and bundle_member is None:
                 raise FileNotFoundError('File not found on the cloud server!', self._logger)
 
             dir_where_to_download = self.artifacts_path
@@ -276,8 +719,11 @@ class CloudManager(object):
                 self._logger.info('Downloading aborted.')
                 return
 
-            with open(path_where_to_download, 'wb') as file:
-                ftp_conn.retrbinary('RETR ' + filename, file.write)
+            self._retry(ftp_conn,
+                        lambda resume: self._retrieve_file(ftp_conn, file_dir, bucket_contents, manifest,
+                                                           path_where_to_download, resume,
+                                                           bundle_member=bundle_member),
+                        directory=file_dir)
 
         if path_where_to_download.exists():
             self._logger.info(f'File {filename} downloding to '
@@ -287,6 +733,642 @@ class CloudManager(object):
 
         return path_where_to_download.as_posix()
 
+    @check_credentials
+    @handle_ftplib_error
+    def sync_up(self, workers=SYNC_WORKERS):
+        self._logger.info('Synchronize artifacts with the cloud server...')
+
+        transfers = []
+        summary = SyncSummary()
+        with self._connect() as ftp_conn:
+            self._create_buckets_tree(ftp_conn)
+            for bucket in self.buckets_list:
+                local_files = self._get_local_bucket_files(bucket)
+                remote_files = self._get_remote_bucket_files(ftp_conn, bucket.name)
+                outdated = self._get_outdated_files(local_files, remote_files)
+                transfers.extend(Transfer(bucket_name=bucket.name, local_path=local_files[name].path,
+                                          size=local_files[name].size, mtime=local_files[name].mtime)
+                                 for name in outdated)
+                summary.bytes_total += sum(file.size for file in local_files.values())
+                summary.skipped.extend((self._get_project_bucket_path() / bucket.name / name).as_posix()
+                                       for name in sorted(local_files.keys() - set(outdated)))
+
+        for transfer in self._execute_transfers(transfers, functools.partial(self._upload_transfer, metrics=summary),
+                                                workers, summary):
+            summary.transferred.append(self._get_remote_file_path(transfer))
+            summary.bytes_transferred += transfer.size
+
+        summary.transferred.sort()
+        self._log_sync_summary(summary)
+
+        return summary
+
+    @check_credentials
+    @handle_ftplib_error
+    def sync_down(self, workers=SYNC_WORKERS):
+        self._logger.info('Synchronize artifacts from the cloud server...')
+
+        transfers = []
+        summary = SyncSummary()
+        with self._connect() as ftp_conn:
+            if not self._is_path_exists(ftp_conn, self._get_project_bucket_path()):
+                self._logger.info('There are no buckets on the cloud server.')
+                return summary
+
+            for bucket in self.buckets_list:
+                remote_files = self._get_remote_bucket_files(ftp_conn, bucket.name)
+                local_dir = self._get_download_dir(bucket.name)
+                local_files = {}
+                if local_dir.is_dir():
+                    local_files = {path.name: self._get_local_file_entry(path)
+                                   for path in local_dir.iterdir() if path.is_file()}
+                outdated = self._get_outdated_files(remote_files, local_files)
+                transfers.extend(Transfer(bucket_name=bucket.name, local_path=local_dir / name,
+                                          size=remote_files[name].size, mtime=remote_files[name].mtime)
+                                 for name in outdated)
+                summary.bytes_total += sum(file.size for file in remote_files.values())
+                summary.skipped.extend((local_dir / name).as_posix()
+                                       for name in sorted(remote_files.keys() - set(outdated)))
+
+        for transfer in self._execute_transfers(transfers, functools.partial(self._download_transfer, metrics=summary),
+                                                workers, summary):
+            summary.transferred.append(transfer.local_path.as_posix())
+            summary.bytes_transferred += transfer.size
+
+        summary.transferred.sort()
+        self._log_sync_summary(summary)
+
+        return summary
+
+    @contextlib.contextmanager
+    def _connect(self):
+        if self.session_pool is None:
+            with self._open_connection() as ftp_conn:
+                yield ftp_conn
+        else:
+            with self.session_pool.session(self) as ftp_conn:
+                yield ftp_conn
+
+    def _open_connection(self):
+        port = int(self.credentials.port) if self.credentials.port else ftplib.FTP_PORT
+        if self._is_enabled(self.credentials.use_tls):
+            session_key = (self.credentials.server, port)
+            if session_key in self._tls_sessions:
+                context, session = self._tls_sessions[session_key]
+            else:
+                context, session = ssl.create_default_context(cafile=self.credentials.tls_cafile or None), None
+            ftp_conn = _ReusedSessionFTP_TLS(context=context, session=session)
+        else:
+            ftp_conn = ftplib.FTP()
+
+        self._login(ftp_conn)
+
+        return ftp_conn
+
+    def _login(self, ftp_conn):
+        port = int(self.credentials.port) if self.credentials.port else ftplib.FTP_PORT
+        try:
+            ftp_conn.connect(self.credentials.server, port)
+            ftp_conn.login(self.credentials.username, self.credentials.password)
+            if isinstance(ftp_conn, ftplib.FTP_TLS):
+                ftp_conn.prot_p()
+                self._tls_sessions[(self.credentials.server, port)] = (ftp_conn.context, ftp_conn.sock.session)
+        except BaseException:
+            ftp_conn.close()
+            raise
+
+    def _reconnect(self, ftp_conn, directory=None):
+        ftp_conn.close()
+        if isinstance(ftp_conn, _ReusedSessionFTP_TLS):
+            port = int(self.credentials.port) if self.credentials.port else ftplib.FTP_PORT
+            ftp_conn.session = self._tls_sessions.get((self.credentials.server, port), (None, None))[1]
+        self._login(ftp_conn)
+        if directory is not None:
+            ftp_conn.cwd(directory.as_posix())
+
+    def _retry(self, ftp_conn, operation, directory=None, metrics=None, is_retryable=None):
+        is_retryable = self._is_transient_error if is_retryable is None else is_retryable
+        attempt = 0
+        while True:
+            try:
+                if attempt:
+                    self._reconnect(ftp_conn, directory)
+                return operation(attempt > 0)
+            except ftplib.all_errors + (FtpError,) as e:
+                error = e.__cause__ if isinstance(e, FtpError) else e
+                attempt += 1
+                if not is_retryable(error) or attempt > RETRY_ATTEMPTS:
+                    raise
+                self._wait_before_retry(error, attempt, metrics)
+
+    def _wait_before_retry(self, error, attempt, metrics=None):
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+        self._logger.warning(f'Transient ftp error: {error}. Retrying in {delay:.1f} s.')
+        if metrics is not None:
+            with self._metrics_lock:
+                metrics.retries += 1
+        time.sleep(delay)
+
+    @staticmethod
+    def _is_transient_error(error):
+        return isinstance(error, (ftplib.error_temp, EOFError, ConnectionError, socket.timeout, TimeoutError))
+
+    @staticmethod
+    def _get_remote_size(ftp_conn, filename):
+        try:
+            ftp_conn.voidcmd('TYPE I')
+            return ftp_conn.size(filename)
+        except ftplib.error_perm:
+            return None
+
+    @staticmethod
+    def _is_enabled(value):
+        return str(value).strip().lower() in ['yes', 'true', 'y', '1']
+
+    def _get_local_bucket_files(self, bucket):
+        local_files = {}
+        if self.artifacts_path.is_dir():
+            for keyword in bucket.keywords:
+                for path in self.artifacts_path.rglob(f'*{keyword}*'):
+                    if path.is_file():
+                        entry = self._get_local_file_entry(path)
+                        if path.name not in local_files or local_files[path.name].mtime < entry.mtime:
+                            local_files[path.name] = entry
+
+        return local_files
+
+    @staticmethod
+    def _get_local_file_entry(path):
+        stat_result = path.stat()
+        return FileEntry(path=path, size=stat_result.st_size, mtime=int(stat_result.st_mtime))
+
+    @handle_ftplib_error
+    def _get_remote_bucket_files(self, ftp_conn, bucket_name):
+        bucket_path = self._get_project_bucket_path() / bucket_name
+        if not self._is_path_exists(ftp_conn, bucket_path):
+            return {}
+
+        remote_files = {}
+        for name, facts in self._list_bucket_entries(ftp_conn):
+            remote_files[name] = FileEntry(path=bucket_path / name,
+                                           size=int(facts['size']),
+                                           mtime=self._parse_ftp_time(facts['modify']))
+
+        return remote_files
+
+    def _list_bucket_entries(self, ftp_conn):
+        entries = []
+        bucket_entries = list(ftp_conn.mlsd())
+        names = {name for name, _ in bucket_entries}
+        for name, facts in bucket_entries:
+            if self._is_checksum_file(name, names) or name + BUNDLE_INDEX_SUFFIX in names:
+                continue
+            if name.endswith(BUNDLE_INDEX_SUFFIX):
+                for member in self._read_bundle_index(ftp_conn, name):
+                    if member.name in names:
+                        continue
+                    entries.append((member.name, dict(facts, size=str(member.size),
+                                                      modify=self._format_ftp_time(member.mtime))))
+                continue
+            chunked_filename = self._get_chunked_filename(name)
+            if chunked_filename:
+                manifest = self._read_chunks_manifest(ftp_conn, name)
+                if manifest is not None:
+                    entries.append((chunked_filename, dict(facts, size=str(manifest['size']),
+                                                           modify=self._format_ftp_time(manifest['mtime']))))
+            elif facts.get('type', 'file') == 'file':
+                entries.append((name, facts))
+
+        return entries
+
+    @staticmethod
+    def _get_outdated_files(src_files, dst_files):
+        outdated = []
+        for name, src in sorted(src_files.items()):
+            dst = dst_files.get(name)
+            if dst is None or dst.size != src.size or src.mtime > dst.mtime:
+                outdated.append(name)
+
+        return outdated
+
+    def _execute_transfers(self, transfers, handler, workers, metrics=None):
+        if not transfers:
+            return []
+
+        transfers_queue = queue.Queue()
+        for transfer in transfers:
+            transfers_queue.put(transfer)
+        interrupted = set()
+        abort_event = threading.Event()
+        controller = self._get_concurrency_controller(min(workers, len(transfers)))
+
+        def is_retryable(error):
+            return self._is_transient_error(error) and not controller.is_backoff_error(error)
+
+        def worker():
+            done = []
+            released = False
+            transfer = None
+            try:
+                with self._connect() as ftp_conn:
+                    while not abort_event.is_set():
+                        if controller.release_if_over_limit():
+                            released = True
+                            break
+                        try:
+                            transfer = transfers_queue.get_nowait()
+                        except queue.Empty:
+                            transfer = None
+                            break
+                        self._retry(ftp_conn,
+                                    lambda resume: handler(ftp_conn, transfer, resume or transfer in interrupted),
+                                    metrics=metrics,
+                                    is_retryable=is_retryable)
+                        controller.record_success(transfer.size)
+                        done.append(transfer)
+                        transfer = None
+            except BaseException as e:
+                if abort_event.is_set() or not controller.is_backoff_error(e) or not controller.record_backoff():
+                    abort_event.set()
+                    raise
+                self._logger.warning(f'Server {self.credentials.server} refused more sessions ({e}). '
+                                     f'Concurrency reduced to {controller.limit}.')
+                if transfer is not None:
+                    self._wait_before_retry(e, controller.consecutive_backoffs, metrics)
+                    interrupted.add(transfer)
+                    transfers_queue.put(transfer)
+            finally:
+                if not released:
+                    controller.release()
+
+            return done
+
+        completed = []
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
+            running = set()
+            while running or (not transfers_queue.empty() and not abort_event.is_set()):
+                while not transfers_queue.empty() and not abort_event.is_set():
+                    if len(running) >= controller.max_limit or not controller.acquire():
+                        break
+                    running.add(executor.submit(worker))
+                finished, running = concurrent.futures.wait(running, timeout=CONCURRENCY_POLL_INTERVAL,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    if future.exception() is None:
+                        completed.extend(future.result())
+                    else:
+                        errors.append(future.exception())
+
+        if errors:
+            raise errors[0]
+
+        return completed
+
+    def _get_concurrency_controller(self, max_limit):
+        port = self.credentials.port or ftplib.FTP_PORT
+        return ConcurrencyController((self.credentials.server, str(port)), max_limit)
+
+    def _upload_transfer(self, ftp_conn, transfer, resume=False, metrics=None):
+        ftp_conn.cwd((self._get_project_bucket_path() / transfer.bucket_name).as_posix())
+        is_chunked = self._is_chunked(transfer)
+        self._store_file(ftp_conn, transfer, resume, metrics)
+        if is_chunked:
+            self._logger.info(f'File {transfer.local_path.name} synchronized to the bucket {ftp_conn.pwd()}.')
+            return
+
+        try:
+            ftp_conn.sendcmd(f'MFMT {self._format_ftp_time(transfer.mtime)} {transfer.local_path.name}')
+        except ftplib.error_perm:
+            pass
+        self._logger.info(f'File {transfer.local_path.name} synchronized to the bucket {ftp_conn.pwd()}.')
+
+    def _download_transfer(self, ftp_conn, transfer, resume=False, metrics=None):
+        bucket_path = self._get_project_bucket_path() / transfer.bucket_name
+        ftp_conn.cwd(bucket_path.as_posix())
+        transfer.local_path.parent.mkdir(parents=True, exist_ok=True)
+        bucket_contents = ftp_conn.nlst()
+        manifest, bundle_member = self._locate_remote_file(ftp_conn, bucket_contents, transfer.local_path.name)
+        self._retrieve_file(ftp_conn, bucket_path, bucket_contents, manifest, transfer.local_path, resume, metrics,
+                            bundle_member)
+        os.utime(transfer.local_path, (transfer.mtime, transfer.mtime))
+        self._logger.info(f'File {transfer.local_path.name} synchronized to {transfer.local_path.parent}.')
+
+    def _get_download_dir(self, bucket_name):
+        bucket_dir = self.artifacts_path / bucket_name
+        return bucket_dir if bucket_dir.is_dir() else self.artifacts_path
+
+    def _log_sync_summary(self, summary):
+        self._logger.info(f'Synchronization completed: {len(summary.transferred)} files transferred '
+                          f'({summary.bytes_transferred} B), {len(summary.skipped)} files up to date. '
+                          f'Saved {summary.bytes_saved} B of {summary.bytes_total} B versus a full copy.')
+        if summary.retries:
+            self._logger.info(f'Transient ftp errors required {summary.retries} retries.')
+
+    @staticmethod
+    def _parse_ftp_time(value):
+        return int(datetime.datetime.strptime(value[:14], FTP_TIME_FORMAT)
+                   .replace(tzinfo=datetime.timezone.utc).timestamp())
+
+    @staticmethod
+    def _format_ftp_time(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime(FTP_TIME_FORMAT)
+
+    def _is_chunked(self, transfer):
+        return bool(self.chunk_size) and transfer.size > self.chunk_size
+
+    def _is_chunked_file_exists(self, ftp_conn, buckets_contents, filename):
+        chunks_dir_name = self._get_chunks_dir_name(filename)
+        if chunks_dir_name not in buckets_contents:
+            return False
+
+        return self._read_chunks_manifest(ftp_conn, chunks_dir_name) is not None
+
+    @staticmethod
+    def _get_chunks_dir_name(filename):
+        return f'{CHUNKS_DIR_PREFIX}{filename}{CHUNKS_DIR_SUFFIX}'
+
+    @staticmethod
+    def _get_chunked_filename(chunks_dir_name):
+        if chunks_dir_name.startswith(CHUNKS_DIR_PREFIX) and chunks_dir_name.endswith(CHUNKS_DIR_SUFFIX):
+            return chunks_dir_name[len(CHUNKS_DIR_PREFIX):-len(CHUNKS_DIR_SUFFIX)] or None
+        return None
+
+    @staticmethod
+    def _read_chunks_manifest(ftp_conn, chunks_dir_name):
+        buffer = io.BytesIO()
+        try:
+            ftp_conn.retrbinary(f'RETR {chunks_dir_name}/{CHUNKS_MANIFEST_FILENAME}', buffer.write)
+        except ftplib.error_perm:
+            return None
+
+        return json.loads(buffer.getvalue().decode('utf-8'))
+
+    def _upload_chunked(self, ftp_conn, transfer, resume=False, metrics=None):
+        bucket_path = self._get_project_bucket_path() / transfer.bucket_name
+        chunks_dir = bucket_path / self._get_chunks_dir_name(transfer.local_path.name)
+        if not self._is_path_exists(ftp_conn, chunks_dir):
+            ftp_conn.mkd(chunks_dir.as_posix())
+            resume = False
+
+        parts = [ChunkPart(chunks_dir=chunks_dir, name=f'part-{index:05d}', offset=offset,
+                           size=min(self.chunk_size, transfer.size - offset), local_path=transfer.local_path)
+                 for index, offset in enumerate(range(0, transfer.size, self.chunk_size))]
+        parts_digests = {}
+
+        def upload_part(part_conn, part, resume_part=False):
+            parts_digests[part.name] = self._upload_chunk_part(part_conn, part, resume or resume_part)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            file_digest = executor.submit(self._hash_file, transfer.local_path)
+            self._execute_transfers(parts, upload_part, CHUNK_WORKERS, metrics)
+
+            manifest = {
+                'name': transfer.local_path.name,
+                'size': transfer.size,
+                'mtime': transfer.mtime,
+                'chunk_size': self.chunk_size,
+                'parts': [{'name': part.name, 'offset': part.offset, 'size': part.size,
+                           'sha256': parts_digests[part.name]} for part in parts],
+            }
+            ftp_conn.cwd(chunks_dir.as_posix())
+            ftp_conn.storbinary(f'STOR {CHUNKS_MANIFEST_FILENAME}',
+                                io.BytesIO(json.dumps(manifest).encode('utf-8')))
+            ftp_conn.cwd(bucket_path.as_posix())
+
+            return file_digest.result()
+
+    def _upload_chunk_part(self, ftp_conn, part, resume=False):
+        ftp_conn.cwd(part.chunks_dir.as_posix())
+        with open(part.local_path, 'rb') as file:
+            return self._store_data(ftp_conn, part.chunks_dir / part.name, file, part.offset, part.size, resume)
+
+    def _store_data(self, ftp_conn, remote_path, file, offset, size, resume=False):
+        upload_key = (self.credentials.server, self.credentials.port, remote_path.as_posix())
+        bytes_sent = self._started_uploads.get(upload_key)
+        rest = self._get_remote_size(ftp_conn, remote_path.name) if resume and bytes_sent else None
+        if rest is None or rest > min(size, bytes_sent):
+            rest = 0
+
+        reader = _HashingReader(_FileSlice(file, offset, size))
+        reader.skip(rest)
+        if not rest or rest < size:
+            try:
+                ftp_conn.storbinary(f'STOR {remote_path.name}', reader, rest=rest or None)
+            except BaseException:
+                self._started_uploads[upload_key] = reader.bytes_read
+                raise
+        self._started_uploads.pop(upload_key, None)
+        if rest:
+            self._logger.info(f'Upload of {remote_path.name} resumed at {rest} B.')
+
+        return reader.hash.hexdigest()
+
+    def _download_chunked(self, chunks_dir, manifest, path, metrics=None):
+        with open(path, 'wb') as file:
+            file.truncate(manifest['size'])
+
+        parts = [ChunkPart(chunks_dir=chunks_dir, name=part['name'], offset=part['offset'], size=part['size'],
+                           local_path=path, sha256=part.get('sha256')) for part in manifest['parts']]
+        self._execute_transfers(parts, self._download_chunk_part, CHUNK_WORKERS, metrics)
+
+    def _download_chunk_part(self, ftp_conn, part, resume=False):
+        ftp_conn.cwd(part.chunks_dir.as_posix())
+        with open(part.local_path, 'r+b') as file:
+            file.seek(part.offset)
+            writer = _HashingWriter(file.write)
+            ftp_conn.retrbinary(f'RETR {part.name}', writer)
+
+        if part.sha256 and writer.hash.hexdigest() != part.sha256:
+            raise ChecksumError(f'Checksum mismatch of the {part.name} part of the {part.local_path.name} file!',
+                                self._logger)
+
+    def _store_file(self, ftp_conn, transfer, resume=False, metrics=None):
+        if self._is_chunked(transfer):
+            digest = self._upload_chunked(ftp_conn, transfer, resume, metrics)
+        else:
+            with open(transfer.local_path, 'rb') as file:
+                digest = self._store_data(ftp_conn, Path(self._get_remote_file_path(transfer)), file, 0,
+                                          transfer.size, resume)
+
+        checksum_line = f'{digest}  {transfer.local_path.name}\n'
+        ftp_conn.storbinary(f'STOR {self._get_checksum_filename(transfer.local_path.name)}',
+                            io.BytesIO(checksum_line.encode('utf-8')))
+
+    def _retrieve_file(self, ftp_conn, bucket_path, bucket_contents, manifest, path, resume=False, metrics=None,
+                       bundle_member=None):
+        try:
+            if bundle_member is not None:
+                self._retrieve_bundle_member(ftp_conn, bundle_member, path)
+            elif manifest is None:
+                expected_digest = self._read_checksum(ftp_conn, bucket_contents, path.name)
+                rest = path.stat().st_size if resume and path.exists() else 0
+                with open(path, 'ab' if rest else 'wb') as file:
+                    writer = _HashingWriter(file.write)
+                    if rest:
+                        with open(path, 'rb') as downloaded_file:
+                            reader = _HashingReader(downloaded_file)
+                            reader.skip(rest)
+                        writer.hash = reader.hash
+                        self._logger.info(f'Download of {path.name} resumed at {rest} B.')
+                    ftp_conn.retrbinary('RETR ' + path.name, writer, rest=rest or None)
+                if expected_digest and writer.hash.hexdigest() != expected_digest:
+                    raise ChecksumError(f'Checksum mismatch of the {path.name} file!', self._logger)
+            else:
+                self._download_chunked(bucket_path / self._get_chunks_dir_name(path.name), manifest, path, metrics)
+        except ChecksumError:
+            path.unlink()
+            raise
+
+    def _read_checksum(self, ftp_conn, bucket_contents, filename):
+        checksum_filename = self._get_checksum_filename(filename)
+        if checksum_filename not in bucket_contents:
+            return None
+
+        buffer = io.BytesIO()
+        ftp_conn.retrbinary(f'RETR {checksum_filename}', buffer.write)
+        return buffer.getvalue().decode('utf-8').split()[0]
+
+    @staticmethod
+    def _get_checksum_filename(filename):
+        return filename + CHECKSUM_FILE_SUFFIX
+
+    def _is_checksum_file(self, name, bucket_contents):
+        filename = name[:-len(CHECKSUM_FILE_SUFFIX)]
+        if not name.endswith(CHECKSUM_FILE_SUFFIX):
+            return False
+
+        return filename in bucket_contents or self._get_chunks_dir_name(filename) in bucket_contents
+
+    @staticmethod
+    def _hash_file(path):
+        file_hash = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                file_hash.update(block)
+
+        return file_hash.hexdigest()
+
+    def _get_bucket(self, bucket_name):
+        for bucket in self.buckets_list:
+            if bucket.name == bucket_name:
+                return bucket
+
+        raise BucketNotFoundError(f'Bucket {bucket_name} not found!', self._logger)
+
+    @staticmethod
+    def _get_bundle_archive_name():
+        return f'{datetime.datetime.now(datetime.timezone.utc).strftime(BUNDLE_TIME_FORMAT)}{BUNDLE_SUFFIX}'
+
+    def _store_bundle(self, ftp_conn, bucket_contents, transfers, archive_name):
+        bundled_files = {member.name for member in self._read_bundle_indexes(ftp_conn, bucket_contents)}
+        transfers_to_bundle = []
+        for transfer in transfers:
+            if transfer.local_path.name in bundled_files or transfer.local_path.name in bucket_contents:
+                self._logger.warning(f'{transfer.local_path.name} already exists in the server bucket: '
+                                     f'{ftp_conn.pwd()}. Uploading aborted.')
+            else:
+                transfers_to_bundle.append(transfer)
+        if not transfers_to_bundle:
+            return False
+
+        index = []
+        read_fd, write_fd = os.pipe()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            with open(read_fd, 'rb') as archive_stream:
+                writing = executor.submit(self._write_bundle, write_fd, transfers_to_bundle, archive_name, index)
+                # The archive is complete only when the writer succeeded, fail the transfer before it is finished
+                reader = _HashingReader(archive_stream, on_eof=writing.result)
+                try:
+                    ftp_conn.storbinary(f'STOR {archive_name}', reader)
+                except Exception as e:
+                    if writing.done() and writing.exception() is e:
+                        self._delete_partial_bundle(ftp_conn, archive_name)
+                    raise
+
+        ftp_conn.storbinary(f'STOR {archive_name}{BUNDLE_INDEX_SUFFIX}',
+                            io.BytesIO(json.dumps([member._asdict() for member in index]).encode('utf-8')))
+        checksum_line = f'{reader.hash.hexdigest()}  {archive_name}\n'
+        ftp_conn.storbinary(f'STOR {self._get_checksum_filename(archive_name)}',
+                            io.BytesIO(checksum_line.encode('utf-8')))
+        self._logger.info(f'{len(index)} files bundled into {archive_name}.')
+
+        return True
+
+    def _delete_partial_bundle(self, ftp_conn, archive_name):
+        self._logger.warning(f'Writing {archive_name} failed. Deleting the partial archive from the server.')
+        try:
+            ftp_conn.voidresp()
+        except ftplib.all_errors:
+            pass
+        try:
+            ftp_conn.delete(archive_name)
+        except ftplib.all_errors as e:
+            self._logger.warning(f'Partial archive {archive_name} not deleted: {e}')
+
+    @staticmethod
+    def _write_bundle(write_fd, transfers, archive_name, index):
+        with open(write_fd, 'wb') as archive_stream, tarfile.open(fileobj=archive_stream, mode='w|') as tar:
+            for transfer in transfers:
+                tarinfo = tar.gettarinfo(transfer.local_path, arcname=transfer.local_path.name)
+                with open(transfer.local_path, 'rb') as file:
+                    reader = _HashingReader(file)
+                    tar.addfile(tarinfo, reader)
+                padded_size = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                index.append(BundleMember(archive_name=archive_name, name=tarinfo.name,
+                                          offset=tar.offset - padded_size, size=tarinfo.size,
+                                          mtime=int(tarinfo.mtime), sha256=reader.hash.hexdigest()))
+
+    def _read_bundle_indexes(self, ftp_conn, bucket_contents):
+        members = []
+        for name in sorted(bucket_contents, reverse=True):
+            if name.endswith(BUNDLE_INDEX_SUFFIX):
+                members.extend(self._read_bundle_index(ftp_conn, name))
+
+        return members
+
+    @staticmethod
+    def _read_bundle_index(ftp_conn, index_name):
+        buffer = io.BytesIO()
+        try:
+            ftp_conn.retrbinary(f'RETR {index_name}', buffer.write)
+        except ftplib.error_perm:
+            return []
+
+        return [BundleMember(**member) for member in json.loads(buffer.getvalue().decode('utf-8'))]
+
+    def _locate_remote_file(self, ftp_conn, bucket_contents, filename):
+        if self._get_chunks_dir_name(filename) in bucket_contents:
+            manifest = self._read_chunks_manifest(ftp_conn, self._get_chunks_dir_name(filename))
+            if manifest is not None:
+                return manifest, None
+        if filename not in bucket_contents:
+            for member in self._read_bundle_indexes(ftp_conn, bucket_contents):
+                if member.name == filename:
+                    return None, member
+
+        return None, None
+
+    def _retrieve_bundle_member(self, ftp_conn, member, path):
+        with open(path, 'wb') as file:
+            writer = _HashingWriter(file.write)
+            remaining = member.size
+            ftp_conn.voidcmd('TYPE I')
+            with ftp_conn.transfercmd(f'RETR {member.archive_name}', rest=member.offset) as data_conn:
+                while remaining > 0:
+                    data = data_conn.recv(min(HASH_BLOCK_SIZE, remaining))
+                    if not data:
+                        raise EOFError(f'Bundle {member.archive_name} ended before the {member.name} file.')
+                    writer(data)
+                    remaining -= len(data)
+            try:
+                ftp_conn.voidresp()
+            except (ftplib.error_temp, ftplib.error_perm):
+                pass
+
+        if writer.hash.hexdigest() != member.sha256:
+            raise ChecksumError(f'Checksum mismatch of the {member.name} file!', self._logger)
+
     def _get_bucket_name_from_filename(self, filename):
         for bucket in self.buckets_list:
             for keyword in bucket.keywords:
@@ -310,34 +1392,98 @@ class CloudManager(object):
         return None
 
     @handle_ftplib_error
-    def _upload_file_to_bucket(self, ftp_conn, file_path, bucket_name):
-        ftp_conn.cwd((self._get_project_bucket_path() / bucket_name).as_posix())
-        buckets_contents = ftp_conn.nlst()
-        if file_path.name not in buckets_contents:
-            with open(file_path, 'rb') as file:
-                ftp_conn.storbinary('STOR ' + file_path.name, file)
-            if file_path.name in ftp_conn.nlst():
-                self._logger.info(f'File {file_path.name} uploaded properly to the bucket {ftp_conn.pwd()}!')
+    def _execute_upload_plan(self, ftp_conn, plan):
+        uploaded_files = []
+        self._retry(ftp_conn, lambda resume: self._create_buckets_tree(ftp_conn), metrics=plan)
+        for bucket_name in plan.buckets:
+            bucket_path = self._get_project_bucket_path() / bucket_name
+            buckets_contents = self._retry(ftp_conn, lambda resume: self._list_bucket(ftp_conn, bucket_path),
+                                           metrics=plan)
+            stored_files = []
+            bucket_transfers = plan.get_bucket_transfers(bucket_name)
+            if self._get_bucket(bucket_name).bundle:
+                archive_name = self._get_bundle_archive_name()
+                if self._retry(ftp_conn,
+                               lambda resume: self._store_bundle(ftp_conn, buckets_contents, bucket_transfers,
+                                                                 archive_name),
+                               directory=bucket_path, metrics=plan):
+                    stored_files.append(archive_name)
+                uploaded_files.extend(self._get_remote_file_path(transfer) for transfer in bucket_transfers)
+                bucket_transfers = []
+
+            for transfer in bucket_transfers:
+                filename = transfer.local_path.name
+                is_stored = filename in buckets_contents
+                if not is_stored and not self._is_chunked_file_exists(ftp_conn, buckets_contents, filename):
+                    self._retry(ftp_conn, lambda resume: self._store_file(ftp_conn, transfer, resume, plan),
+                                directory=bucket_path, metrics=plan)
+                    stored_files.append(transfer.local_path.name)
+                else:
+                    self._logger.warning(f'{transfer.local_path.name} already exists in the server bucket: '
+                                         f'{ftp_conn.pwd()}. Uploading aborted.')
+                uploaded_files.append(self._get_remote_file_path(transfer))
+
+            if stored_files:
+                buckets_contents = self._retry(ftp_conn, lambda resume: self._list_bucket(ftp_conn, bucket_path),
+                                               metrics=plan)
+                for filename in stored_files:
+                    if filename in buckets_contents or self._get_chunks_dir_name(filename) in buckets_contents:
+                        self._logger.info(f'File {filename} uploaded properly to the bucket {ftp_conn.pwd()}!')
+                    else:
+                        self._logger.info(f'File {filename} uploading error!')
+
+        if plan.retries:
+            self._logger.info(f'Transient ftp errors required {plan.retries} retries.')
+
+        return uploaded_files
+
+    @staticmethod
+    def _list_bucket(ftp_conn, bucket_path):
+        ftp_conn.cwd(bucket_path.as_posix())
+        return ftp_conn.nlst()
+
+    def _log_upload_plan(self, plan):
+        self._logger.info(f'Upload plan: {len(plan.transfers)} files, {plan.bytes_total} B '
+                          f'in {len(plan.buckets)} buckets, about {self._estimate_round_trips(plan)} round trips.')
+
+    @check_credentials
+    def _estimate_round_trips(self, plan):
+        if not plan.transfers:
+            return 0
+
+        project_bucket_path = self._get_project_bucket_path()
+        round_trips = FTP_SESSION_ROUND_TRIPS
+        # Buckets tree check, see _create_buckets_tree
+        round_trips += 3 + len(project_bucket_path.parents) + 2 * len(self.buckets_list)
+        # CWD and NLST before and after uploading to each bucket
+        for bucket_name in plan.buckets:
+            round_trips += 1 + 2 * FTP_TRANSFER_ROUND_TRIPS
+            if self._get_bucket(bucket_name).bundle:
+                # The archive and its index
+                round_trips += 2 * FTP_TRANSFER_ROUND_TRIPS
             else:
-                self._logger.info(f'File {file_path.name} uploading error!')
-        else:
-            self._logger.warning(f'{file_path.name} already exists in the server bucket: {ftp_conn.pwd()}. '
-                                 f'Uploading aborted.')
+                round_trips += FTP_TRANSFER_ROUND_TRIPS * len(plan.get_bucket_transfers(bucket_name))
+
+        return round_trips
+
+    def _get_remote_file_path(self, transfer):
+        return (self._get_project_bucket_path() / transfer.bucket_name / transfer.local_path.name).as_posix()
 
     @handle_ftplib_error
     def _print_bucket_files(self, ftp_conn, project_bucket_path, bucket):
         ftp_conn.cwd(project_bucket_path.as_posix())
         if bucket in ftp_conn.nlst():
             ftp_conn.cwd(bucket)
-            bucket_files = sorted(list(ftp_conn.mlsd()), key=lambda k: k[1]['modify'])
+            bucket_files = sorted(self._list_bucket_entries(ftp_conn), key=lambda k: k[1]['modify'])
             if bucket_files:
-                self._logger.info(f'========== The {bucket} bucket files: ==========')
+                lines = [f'========== The {bucket} bucket files: ==========',
+                         f"{'Owner':10} {'Size':10} {'Time':19} Name"]
                 files_list = []
                 for file in bucket_files:
                     files_list.append(file[0])
-                    self._logger.info(f"{'Owner':10} {'Size':10} {'Time':19} Name")
-                    self._logger.info(f"{file[1]['unix.owner']:10} {file[1]['size']:10} "
-                                      f"{datetime.datetime.strptime(file[1]['modify'], '%Y%m%d%H%M%S')} {file[0]}")
+                    lines.append(f"{file[1]['unix.owner']:10} {file[1]['size']:10} "
+                                 f"{datetime.datetime.strptime(file[1]['modify'], '%Y%m%d%H%M%S')} {file[0]}")
+                self._logger.info('\n'.join(lines))
 
                 return files_list
             else:
@@ -388,7 +1534,9 @@ class CloudManager(object):
         try:
             ftp_conn.cwd(path.as_posix())
         except ftplib.all_errors as e:
-            if self.get_ftp_errorcode(e) == FTP_ERR_CODE_FILE_UNAVAILABLE:
+            if self._is_transient_error(e):
+                raise
+            elif self.get_ftp_errorcode(e) == FTP_ERR_CODE_FILE_UNAVAILABLE:
                 return False
             else:
                 raise RuntimeError(f'Unknown error occured: {e}', self._logger)
@@ -435,3 +1583,386 @@ class CloudManager(object):
                     break
 
         return True if choice == valid_value else False
+
+
+class SessionPool(object):
+    def __init__(self, max_idle=SESSION_POOL_MAX_IDLE, idle_timeout=SESSION_POOL_IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.opened = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def session(self, cloud_manager):
+        key = self._get_key(cloud_manager.credentials)
+        pooled = self._acquire(key)
+        if pooled is None:
+            ftp_conn = cloud_manager._open_connection()
+            try:
+                home_dir = ftp_conn.pwd()
+            except BaseException:
+                ftp_conn.close()
+                raise
+            with self._lock:
+                self.opened += 1
+        else:
+            ftp_conn, home_dir = pooled
+
+        try:
+            yield ftp_conn
+        except SiCloudManError:
+            self._release(key, ftp_conn, home_dir)
+            raise
+        except BaseException:
+            ftp_conn.close()
+            raise
+        else:
+            self._release(key, ftp_conn, home_dir)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for ftp_conn, _, _ in sessions:
+                self._quit(ftp_conn)
+
+    @staticmethod
+    def _get_key(credentials):
+        return (credentials.server, credentials.port, credentials.username, credentials.use_tls)
+
+    def _acquire(self, key):
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key)
+                if not sessions:
+                    return None
+                ftp_conn, home_dir, released_at = sessions.pop()
+
+            if time.monotonic() - released_at > self.idle_timeout:
+                self._quit(ftp_conn)
+                continue
+            try:
+                ftp_conn.cwd(home_dir)
+            except ftplib.all_errors:
+                ftp_conn.close()
+                continue
+
+            with self._lock:
+                self.reused += 1
+            return ftp_conn, home_dir
+
+    def _release(self, key, ftp_conn, home_dir):
+        with self._lock:
+            sessions = self._idle.setdefault(key, [])
+            if len(sessions) < self.max_idle:
+                sessions.append((ftp_conn, home_dir, time.monotonic()))
+                return
+
+        self._quit(ftp_conn)
+
+    @staticmethod
+    def _quit(ftp_conn):
+        try:
+            ftp_conn.quit()
+        except ftplib.all_errors:
+            ftp_conn.close()
+
+
+class _FairQueue(object):
+    def __init__(self):
+        self._queues = OrderedDict()
+        self._condition = threading.Condition()
+
+    def put(self, client_id, item):
+        with self._condition:
+            self._queues.setdefault(client_id, deque()).append(item)
+            self._condition.notify()
+
+    def get(self):
+        with self._condition:
+            while not self._queues:
+                self._condition.wait()
+            client_id, items = self._queues.popitem(last=False)
+            item = items.popleft()
+            if items:
+                self._queues[client_id] = items
+
+            return item
+
+
+AgentRequest = namedtuple('AgentRequest', 'op args future')
+
+
+class CloudAgent(object):
+    OPERATIONS = ['upload_file', 'list_cloud', 'download_file']
+
+    def __init__(self, cloud_manager, socket_path, workers=AGENT_WORKERS, listing_ttl=AGENT_LISTING_TTL):
+        self.cloud_manager = cloud_manager
+        self.socket_path = Path(socket_path)
+        self.workers = workers
+        self.listing_ttl = listing_ttl
+        self.session_pool = SessionPool(max_idle=workers)
+        self._logger = cloud_manager._logger
+        self._requests = _FairQueue()
+        self._listing = None
+        self._listing_lock = threading.Lock()
+        self._server = None
+
+    def serve_forever(self):
+        if self.cloud_manager.credentials is None:
+            self.cloud_manager.credentials = self.cloud_manager._read_cloud_credentials()
+            if self.cloud_manager.credentials is None:
+                raise CredentialsNotFoundError(f'{CLOUD_CREDENTIALS_FILENAME} file not found!', self._logger)
+        self.cloud_manager.session_pool = self.session_pool
+
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path.as_posix(),
+                                                              self._get_request_handler())
+        self._server.daemon_threads = True
+        workers = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for worker in workers:
+            worker.start()
+
+        self._logger.info(f'Cloud agent listening on {self.socket_path}.')
+        try:
+            self._server.serve_forever()
+        finally:
+            for _ in workers:
+                self._requests.put(None, None)
+            for worker in workers:
+                worker.join()
+            self._server.server_close()
+            self.socket_path.unlink()
+            self.session_pool.close()
+            self.cloud_manager.session_pool = None
+            self._logger.info('Cloud agent stopped.')
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _get_request_handler(self):
+        agent = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    response = agent._handle_request(json.loads(line.decode('utf-8')))
+                    self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+        return RequestHandler
+
+    def _handle_request(self, request):
+        if request.get('op') not in self.OPERATIONS:
+            return {'error': f"Unknown operation: {request.get('op')}", 'error_type': AgentError.__name__}
+
+        future = concurrent.futures.Future()
+        self._requests.put(request.get('client'), AgentRequest(request['op'], request.get('args', {}), future))
+        try:
+            return {'result': future.result()}
+        except Exception as e:
+            return {'error': str(e), 'error_type': type(e).__name__}
+
+    def _work(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            if request.future.set_running_or_notify_cancel():
+                try:
+                    request.future.set_result(getattr(self, f'_{request.op}')(**request.args))
+                except Exception as e:
+                    request.future.set_exception(e)
+
+    def _upload_file(self, file_path, bucket_name):
+        result = self.cloud_manager.upload_file(file_path=file_path, bucket_name=bucket_name, prompt=False)
+        with self._listing_lock:
+            self._listing = None
+
+        return result
+
+    def _list_cloud(self):
+        with self._listing_lock:
+            if self._listing is not None and time.monotonic() - self._listing[0] < self.listing_ttl:
+                return self._listing[1]
+
+        cloud_files = self.cloud_manager.list_cloud()
+        listing = vars(cloud_files) if cloud_files is not None else None
+        with self._listing_lock:
+            self._listing = (time.monotonic(), listing)
+
+        return listing
+
+    def _download_file(self, filename, artifacts_path=None):
+        cloud_manager = self.cloud_manager
+        if artifacts_path is not None:
+            cloud_manager = copy.copy(self.cloud_manager)
+            cloud_manager.artifacts_path = Path(artifacts_path)
+
+        return cloud_manager.download_file(filename=filename)
+
+
+class CloudAgentClient(object):
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, socket_path, client_id=None):
+        self.client_id = str(os.getpid()) if client_id is None else client_id
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(Path(socket_path).as_posix())
+        self._file = self._socket.makefile('rwb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def upload_file(self, file_path, bucket_name):
+        return self._request('upload_file', file_path=Path(file_path).resolve().as_posix(), bucket_name=bucket_name)
+
+    def list_cloud(self):
+        listing = self._request('list_cloud')
+        return SimpleNamespace(**listing) if listing is not None else None
+
+    def download_file(self, filename, artifacts_path=None):
+        if artifacts_path is not None:
+            artifacts_path = Path(artifacts_path).resolve().as_posix()
+        return self._request('download_file', filename=filename, artifacts_path=artifacts_path)
+
+    def _request(self, op, **args):
+        request = {'client': self.client_id, 'op': op, 'args': args}
+        self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise AgentError('Connection to the cloud agent closed!', self._logger)
+
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            error_class = globals().get(response['error_type'])
+            if not (isinstance(error_class, type) and issubclass(error_class, SiCloudManError)):
+                error_class = AgentError
+            raise error_class(response['error'], self._logger)
+
+        return response['result']
+
+
+BatchCommand = namedtuple('BatchCommand', 'line_number name args')
+
+
+class BatchSession(object):
+    COMMANDS = {
+        'upload': ['file_path', 'bucket_name'],
+        'upload-artifacts': [],
+        'list': [],
+        'download': ['filename'],
+        'sync-up': [],
+        'sync-down': [],
+    }
+
+    def __init__(self, cloud_manager):
+        self.cloud_manager = cloud_manager
+        self._logger = cloud_manager._logger
+
+    def parse(self, lines):
+        commands = []
+        for line_number, line in enumerate(lines, 1):
+            tokens = shlex.split(line, comments=True)
+            if not tokens:
+                continue
+            name, *args = tokens
+            if name not in self.COMMANDS:
+                raise ValueError(f'Line {line_number}: unknown command {name}!', self._logger)
+            if len(args) != len(self.COMMANDS[name]):
+                raise ValueError(f"Line {line_number}: {name} expects arguments: "
+                                 f"{' '.join(self.COMMANDS[name]) or 'none'}!", self._logger)
+            commands.append(BatchCommand(line_number, name, args))
+
+        return commands
+
+    def execute(self, commands):
+        session_pool = SessionPool(max_idle=1)
+        self.cloud_manager.session_pool = session_pool
+        try:
+            results = []
+            for command in commands:
+                self._logger.info(f"Line {command.line_number}: {' '.join([command.name] + command.args)}")
+                results.append(self._execute_command(command))
+
+            return results
+        finally:
+            self.cloud_manager.session_pool = None
+            session_pool.close()
+
+    def _execute_command(self, command):
+        if command.name == 'upload':
+            file_path, bucket_name = command.args
+            return self.cloud_manager.upload_file(file_path=file_path, bucket_name=bucket_name, prompt=False)
+        elif command.name == 'upload-artifacts':
+            return self.cloud_manager.upload_artifacts(prompt=False)
+        elif command.name == 'list':
+            return self.cloud_manager.list_cloud()
+        elif command.name == 'download':
+            return self.cloud_manager.download_file(filename=command.args[0])
+        elif command.name == 'sync-up':
+            return self.cloud_manager.sync_up()
+        elif command.name == 'sync-down':
+            return self.cloud_manager.sync_down()
+
+
+def _parse_bucket(value):
+    name, _, keywords = value.partition(':')
+    if not name or not keywords:
+        raise argparse.ArgumentTypeError(f'invalid bucket {value}, expected NAME:KEYWORD[,KEYWORD...]')
+
+    return Bucket(name=name, keywords=keywords.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='sicloudman',
+                                     description='Execute a batch of cloud operations in one session. '
+                                                 f"Commands: {', '.join(BatchSession.COMMANDS)}.")
+    parser.add_argument('script', nargs='?', default='-',
+                        help='file with one command per line, stdin by default')
+    parser.add_argument('-a', '--artifacts-path', default='artifacts', help='artifacts directory')
+    parser.add_argument('-b', '--bucket', dest='buckets', action='append', type=_parse_bucket, required=True,
+                        metavar='NAME:KEYWORDS', help='bucket name with comma separated keywords, repeatable')
+    parser.add_argument('-c', '--credentials-path', help=f'path to the {CLOUD_CREDENTIALS_FILENAME} file')
+    parser.add_argument('--json-log', action='store_true', help='write log records as JSON lines')
+    parser.add_argument('--queue-log', action='store_true', help='write log records from a background thread')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.queue_log:
+        enable_queue_logging(json_format=args.json_log)
+    elif args.json_log:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(JsonFormatter())
+
+    cloud_manager = CloudManager(args.artifacts_path, args.buckets, credentials_path=args.credentials_path,
+                                 cwd=Path.cwd())
+    try:
+        if args.script == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = Path(args.script).read_text().splitlines()
+        batch_session = BatchSession(cloud_manager)
+        batch_session.execute(batch_session.parse(lines))
+    except (SiCloudManError, OSError) as e:
+        cloud_manager._logger.error(str(e))
+        return 1
+    finally:
+        disable_queue_logging()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+import os
+import sys
+import json
+import stat
+import pytest
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import subprocess
+from pathlib import Path
+
+try:
+    import importlib.metadata as importlib_metadata
+except ImportError:
+    import importlib_metadata
+
+from repoassist import pygittools
+from repoassist import exceptions
+from repoassist import utils
+
+
+RUN_ALL_TESTS = True
+
+
+def _error_remove_readonly(_action, name, _exc):
+    Path(name).chmod(stat.S_IWRITE)
+    Path(name).unlink()
+
+
+@pytest.fixture()
+def cwd():
+    workspace_path = Path(tempfile.mkdtemp())
+    yield workspace_path
+    pygittools.close_sessions()
+    pygittools.clear_work_tree_cache()
+    shutil.rmtree(workspace_path, ignore_errors=False, onerror=_error_remove_readonly)
+
+
+def git(args, cwd, timestamp=None):
+    env = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@test.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@test.com')
+    if timestamp is not None:
+        env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = f'{timestamp} +0000'
+    return subprocess.run(['git'] + args, cwd=cwd, env=env, check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, encoding='utf-8').stdout.strip()
+
+
+def make_commit(repo_path, name, timestamp=None):
+    (repo_path / name).write_text(name)
+    git(['add', name], repo_path)
+    git(['commit', '-q', '-m', f'Add {name}'], repo_path, timestamp)
+    return git(['rev-parse', 'HEAD'], repo_path)
+
+
+@pytest.fixture()
+def repo(cwd):
+    repo_path = cwd / 'repo'
+    repo_path.mkdir()
+    git(['init', '-q'], repo_path)
+    return repo_path
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_is_work_tree_SHOULD_cache_work_tree_until_git_dir_removed(cwd, repo):
+    (repo / 'subdir').mkdir()
+    assert pygittools.is_work_tree(cwd) == False
+
+    assert pygittools.is_work_tree(repo / 'subdir') == True
+    spawn_count = pygittools.get_spawn_count()
+    assert pygittools.is_work_tree(repo / 'subdir') == True
+    assert pygittools.list_tags(cwd=repo / 'subdir') == []
+    assert pygittools.get_spawn_count() == spawn_count
+
+    shutil.rmtree(repo / '.git', onerror=_error_remove_readonly)
+
+    assert pygittools.is_work_tree(repo / 'subdir') == False
+    assert pygittools.get_spawn_count() == spawn_count + 1
+    with pytest.raises(pygittools.NotInWorkTreeError):
+        pygittools.list_tags(cwd=repo / 'subdir')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_ref_reader_SHOULD_list_packed_and_loose_tags(repo):
+    first_hash = make_commit(repo, 'first.txt')
+    git(['tag', '-a', '0.1.0', '-m', 'First release'], repo)
+    second_hash = make_commit(repo, 'second.txt')
+    git(['tag', '0.2.0'], repo)
+    git(['pack-refs', '--all'], repo)
+    third_hash = make_commit(repo, 'third.txt')
+    git(['tag', 'feature/0.3.0'], repo)
+    annotated_hash = git(['rev-parse', '0.1.0'], repo)
+
+    reader = pygittools.RefReader.from_work_tree(repo)
+
+    assert (repo / '.git' / 'refs' / 'tags' / '0.1.0').exists() == False
+    assert reader.list_tags() == {
+        '0.1.0': (annotated_hash, first_hash),
+        '0.2.0': (second_hash, second_hash),
+        'feature/0.3.0': (third_hash, None),
+    }
+    assert reader.get_tag('feature/0.3.0') == (third_hash, None)
+    assert reader.get_tag('0.1.0') == (annotated_hash, first_hash)
+    assert reader.get_tag('0.4.0') is None
+    assert reader.is_any_tag() == True
+    assert pygittools.list_tags(repo) == ['0.1.0', '0.2.0', 'feature/0.3.0']
+    assert pygittools.get_tag_commit_hash('0.1.0', repo) == git(['rev-parse', '--short', '0.1.0^{commit}'], repo)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_ref_reader_SHOULD_peel_packed_tags_WHEN_not_fully_peeled(cwd):
+    (cwd / 'packed-refs').write_text('# pack-refs with: peeled \n'
+                                     f'{"a" * 40} refs/heads/master\n'
+                                     f'{"b" * 40} refs/tags/0.1.0\n'
+                                     f'^{"c" * 40}\n'
+                                     f'{"d" * 40} refs/tags/0.2.0\n')
+    reader = pygittools.RefReader(cwd)
+
+    assert reader.list_tags() == {'0.1.0': ('b' * 40, 'c' * 40), '0.2.0': ('d' * 40, None)}
+    assert reader.is_any_tag() == True
+
+    (cwd / 'packed-refs').write_text(f'{"a" * 40} refs/heads/master\n')
+    assert reader.list_tags() == {}
+    assert reader.is_any_tag() == False
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_git_session_SHOULD_read_objects_through_cat_file_batch(repo):
+    first_hash = make_commit(repo, 'first.txt', 1000000000)
+    second_hash = make_commit(repo, 'second.txt', 1000000100)
+    blob_hash = git(['rev-parse', 'HEAD:second.txt'], repo)
+
+    with pygittools.GitSession(repo) as session:
+        assert session.check_object('HEAD') == (second_hash, 'commit', int(git(['cat-file', '-s', 'HEAD'], repo)))
+        assert session.read_object(blob_hash) == (blob_hash, 'blob', b'second.txt')
+        assert session.read_object('missing') is None
+        assert session.resolve('HEAD~1') == first_hash
+        assert session.abbreviate(second_hash) == git(['rev-parse', '--short', 'HEAD'], repo)
+        with pytest.raises(pygittools.ValueError):
+            session.check_object('HEAD\nHEAD')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_are_uncommited_changes_SHOULD_probe_unstaged_and_staged_changes(repo):
+    make_commit(repo, 'first.txt')
+    assert pygittools.are_uncommited_changes(repo) == False
+
+    (repo / 'untracked.txt').write_text('untracked')
+    assert pygittools.are_uncommited_changes(repo) == False
+
+    (repo / 'first.txt').write_text('changed')
+    assert pygittools.are_uncommited_changes(repo) == True
+
+    git(['add', 'first.txt'], repo)
+    assert pygittools.are_uncommited_changes(repo) == True
+
+    with pytest.raises(pygittools.CmdError):
+        pygittools._probe_cmd(['git', 'diff', '--quiet', 'not_existing_rev'], cwd=repo)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_status_summary_SHOULD_parse_renames_spaces_and_untracked_files(repo):
+    make_commit(repo, 'old name.txt')
+    make_commit(repo, 'modified.txt')
+    git(['mv', 'old name.txt', 'new name.txt'], repo)
+    (repo / 'modified.txt').write_text('changed')
+    (repo / 'new file.txt').write_text('untracked')
+
+    summary = pygittools.are_uncommited_changes(repo, summary=True)
+
+    assert summary.staged == ['new name.txt']
+    assert summary.unstaged == ['modified.txt']
+    assert summary.untracked == ['new file.txt']
+    assert summary.conflicted == []
+    assert bool(summary) == True
+
+    git(['commit', '-q', '-a', '-m', 'Rename'], repo)
+    summary = pygittools.get_status_summary(repo)
+
+    assert summary == pygittools.StatusSummary([], [], ['new file.txt'], [])
+    assert bool(summary) == False
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_insert_changelog_entry_SHOULD_insert_entry_after_marker(repo):
+    release = pytest.importorskip('repoassist.release')
+    make_commit(repo, 'first.txt')
+    git(['tag', '-a', '0.1.0', '-m', 'First release'], repo)
+    changelog_path = repo / 'CHANGELOG.md'
+    changelog_path.write_bytes(b'# Changelog\r\n\r\n<!-- Latest release: 0.1.0 -->\n'
+                               b'### Version: 0.1.0 | Released: 2020-01-01 \r\nFirst release\r\n')
+
+    assert release._insert_changelog_entry(changelog_path, '0.2.0', 'Second release', repo) == True
+
+    changelog = changelog_path.read_bytes()
+    assert changelog.startswith(b'# Changelog\r\n\r\n<!-- Latest release: 0.2.0 -->\n### Version: 0.2.0 | Released: ')
+    assert changelog.endswith(b' \nSecond release\n\n### Version: 0.1.0 | Released: 2020-01-01 \r\nFirst release\r\n')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_insert_changelog_entry_SHOULD_not_insert_entry_WHEN_tags_changed(repo):
+    release = pytest.importorskip('repoassist.release')
+    make_commit(repo, 'first.txt')
+    git(['tag', '-a', '0.1.0', '-m', 'First release'], repo)
+    git(['tag', '-a', '0.1.1', '-m', 'Fix release'], repo)
+    changelog_path = repo / 'CHANGELOG.md'
+    changelog = '<!-- Latest release: 0.1.0 -->\n### Version: 0.1.0 | Released: 2020-01-01 \nFirst release\n'
+    changelog_path.write_text(changelog)
+
+    assert release._insert_changelog_entry(changelog_path, '0.2.0', 'Second release', repo) == False
+    assert release._insert_changelog_entry(repo / 'missing.md', '0.2.0', 'Second release', repo) == False
+    assert changelog_path.read_text() == changelog
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_latest_tag_SHOULD_return_same_tag_as_git_describe_WHEN_newer_tag_merged(repo):
+    make_commit(repo, 'base.txt', 1000000000)
+    git(['checkout', '-q', '-b', 'feature'], repo)
+    make_commit(repo, 'feature.txt', 1000005000)
+    git(['tag', '-a', 'v2.0', '-m', 'Feature release'], repo)
+    for i in range(14):
+        make_commit(repo, f'feature_{i}.txt', 1000005100 + i)
+    git(['checkout', '-q', '-'], repo)
+    for i in range(5):
+        make_commit(repo, f'before_{i}.txt', 1000000010 + i)
+    make_commit(repo, 'master.txt', 1000000100)
+    git(['tag', '-a', 'v1.0', '-m', 'Master release'], repo)
+    for i in range(10):
+        make_commit(repo, f'master_{i}.txt', 1000000200 + i)
+    git(['merge', '-q', '--no-edit', 'feature'], repo, 1000010000)
+
+    assert pygittools.get_latest_tag(repo) == git(['describe', '--tags', '--abbrev=0'], repo) == 'v1.0'
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_commit_hash_SHOULD_return_full_or_abbreviated_hash(repo):
+    make_commit(repo, 'first.txt')
+    git(['tag', '-a', '0.1.0', '-m', 'First release'], repo)
+
+    assert pygittools.get_latest_commit_hash(repo, short=False) == git(['rev-parse', 'HEAD'], repo)
+    assert pygittools.get_latest_commit_hash(repo) == git(['rev-parse', '--short', 'HEAD'], repo)
+    assert pygittools.get_tag_commit_hash('0.1.0', repo, short=False) == git(['rev-parse', 'HEAD'], repo)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_latest_tag_SHOULD_raise_error_WHEN_tag_beyond_shallow_boundary(cwd, repo):
+    make_commit(repo, 'first.txt', 1000000000)
+    git(['tag', '-a', '0.1.0', '-m', 'First release'], repo)
+    make_commit(repo, 'second.txt', 1000000100)
+    make_commit(repo, 'third.txt', 1000000200)
+    clone_path = cwd / 'clone'
+    git(['clone', '-q', '--depth', '1', repo.resolve().as_uri(), clone_path.as_posix()], cwd)
+
+    with pytest.raises(pygittools.CmdError):
+        pygittools.get_latest_tag(clone_path)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_build_cache_key_SHOULD_skip_cache_WHEN_untracked_files(repo):
+    release = pytest.importorskip('repoassist.release')
+    make_commit(repo, 'setup.py')
+    cmd = ['sdist']
+
+    cache_key = release._get_build_cache_key(cmd, '0.1.0', repo)
+    assert cache_key is not None
+    assert release._get_build_cache_key(cmd, '0.1.0', repo) == cache_key
+
+    (repo / 'module.py').write_text('print(1)')
+    assert release._get_build_cache_key(cmd, '0.1.0', repo) is None
+
+
+def get_archive_names(dist_path):
+    names = {}
+    for path in dist_path.iterdir():
+        if path.name.endswith('.tar.gz'):
+            with tarfile.open(path) as archive:
+                names[path.name] = sorted(archive.getnames())
+        elif path.name.endswith('.whl'):
+            with zipfile.ZipFile(path) as archive:
+                names[path.name] = sorted(archive.namelist())
+    return names
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_run_setup_cmds_concurrently_SHOULD_build_same_archives_as_serial_build(cwd):
+    release = pytest.importorskip('repoassist.release')
+    pytest.importorskip('wheel')
+    project_path = cwd / 'serial'
+    (project_path / 'demo').mkdir(parents=True)
+    (project_path / 'demo' / '__init__.py').write_text("__version__ = '0.1.0'\n")
+    (project_path / 'setup.py').write_text("from setuptools import setup\n\n"
+                                           "setup(name='demo', version='0.1.0', packages=['demo'], "
+                                           "install_requires=['requests'])\n")
+    concurrent_path = cwd / 'concurrent'
+    shutil.copytree(project_path, concurrent_path)
+
+    subprocess.run([sys.executable, 'setup.py', 'sdist', 'bdist_wheel'], cwd=project_path, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    release._run_setup_cmds_concurrently(['sdist', 'bdist_wheel'], cwd=concurrent_path)
+
+    serial_names = get_archive_names(project_path / 'dist')
+    assert serial_names.__len__() == 2
+    assert 'demo-0.1.0/demo.egg-info/requires.txt' in serial_names['demo-0.1.0.tar.gz']
+    assert get_archive_names(concurrent_path / 'dist') == serial_names
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_stream_cmd_SHOULD_pass_lines_and_keep_bounded_tail_WHEN_cmd_fails(cwd, monkeypatch):
+    monkeypatch.setattr(utils.settings, 'CMD_OUTPUT_TAIL_LINES', 3)
+    code = 'import sys\nfor i in range(10): print(f"line {i}")\nsys.exit(3)\n'
+    lines = []
+    processes = []
+
+    with pytest.raises(exceptions.ExecuteCmdError) as e:
+        utils.stream_cmd([sys.executable, '-c', code], lines.append, cwd, on_start=processes.append)
+
+    assert lines == [f'line {i}' for i in range(10)]
+    assert e.value.returncode == 3
+    assert e.value.__str__() == 'line 7\nline 8\nline 9'
+    assert processes.__len__() == 1 and processes[0].returncode == 3
+
+    utils.stream_cmd([sys.executable, '-c', 'print("done")'], lines.append, cwd)
+    assert lines[-1] == 'done'
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_phase_profiler_SHOULD_record_time_subprocesses_and_written_bytes(cwd, monkeypatch):
+    from repoassist import profiling
+    io_stats_path = cwd / 'io'
+    io_stats_path.write_text('rchar: 10\nwrite_bytes: 4096\n')
+    monkeypatch.setattr(profiling, 'IO_STATS_PATH', io_stats_path)
+    profiler = profiling.PhaseProfiler('release')
+
+    with profiler.phase('build') as phase:
+        utils.stream_cmd([sys.executable, '-c', 'pass'], cwd=cwd)
+        utils.stream_cmd([sys.executable, '-c', 'pass'], cwd=cwd)
+        io_stats_path.write_text('rchar: 10\nwrite_bytes: 12288\n')
+        phase.details['archives'] = 2
+    monkeypatch.setattr(profiling, 'IO_STATS_PATH', cwd / 'missing')
+    with profiler.phase('upload'):
+        pass
+    profiler.write_report(cwd / 'profile.json')
+
+    report = json.loads((cwd / 'profile.json').read_text())
+    assert [phase['name'] for phase in report['phases']] == ['build', 'upload']
+    assert report['phases'][0]['subprocesses'] == 2
+    assert report['phases'][0]['written_bytes'] == 8192
+    assert report['phases'][0]['details'] == {'archives': 2}
+    assert report['phases'][1]['subprocesses'] == 0
+    assert report['phases'][1]['written_bytes'] is None
+    assert report['total']['subprocesses'] == 2
+    assert report['total']['written_bytes'] == 8192
+    assert report['total']['wall_time'] >= report['phases'][0]['wall_time'] > 0
+
+
+def make_file(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_clean_SHOULD_prune_walk_and_report_same_counts_and_bytes_WHEN_dry_run(cwd):
+    from repoassist import clean
+    make_file(cwd / 'demo.egg', 10)
+    make_file(cwd / 'src' / 'demo.egg', 1)
+    make_file(cwd / 'demo.egg-info' / 'PKG-INFO', 20)
+    make_file(cwd / 'build' / 'lib' / 'demo.py', 30)
+    make_file(cwd / 'src' / '__pycache__' / 'demo.pyc', 40)
+    make_file(cwd / 'src' / 'pkg' / '__pycache__' / 'pkg.pyc', 50)
+    make_file(cwd / 'src' / 'build' / 'keep.py', 1)
+    make_file(cwd / '.git' / '__pycache__' / 'keep.pyc', 1)
+    make_file(cwd / 'node_modules' / 'lib' / '__pycache__' / 'keep.pyc', 1)
+    make_file(cwd / 'venv3' / 'lib' / '__pycache__' / 'venv.pyc', 60)
+
+    assert clean.clean(cwd, dry_run=True) == (1, 5, 210)
+    assert (cwd / 'demo.egg').exists() and (cwd / 'venv3').exists()
+    assert clean.clean(cwd) == (1, 5, 210)
+
+    remaining = sorted(path.relative_to(cwd).as_posix() for path in cwd.rglob('*') if path.is_file())
+    assert remaining == ['.git/__pycache__/keep.pyc', 'node_modules/lib/__pycache__/keep.pyc',
+                         'src/build/keep.py', 'src/demo.egg']
+    assert clean.clean(cwd, dry_run=True) == (0, 0, 0)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_write_file_from_template_SHOULD_share_environment_and_cache_bytecode(cwd, monkeypatch):
+    prepare = pytest.importorskip('repoassist.prepare')
+    monkeypatch.setattr(prepare, '_template_environments', {})
+    monkeypatch.setattr(prepare.settings, 'TEMPLATES_CACHE_PATH', cwd / 'cache')
+    templates_path = cwd / 'templates'
+    templates_path.mkdir()
+    for name in ('a.txt', 'b.txt'):
+        (templates_path / f'{name}{prepare.settings.JINJA2_TEMPLATE_EXT}').write_text(f'{name} {{{{ value }}}}\n')
+
+    for name in ('a.txt', 'b.txt'):
+        prepare.write_file_from_template(templates_path / name, cwd / name, {'value': 1}, cwd, verbose=False)
+    environment = prepare._get_template_environment(templates_path)
+
+    assert list(prepare._template_environments.values()) == [environment]
+    assert isinstance(environment.bytecode_cache, prepare.jinja2.FileSystemBytecodeCache)
+    assert list((cwd / 'cache').iterdir()).__len__() == 2
+    assert (cwd / 'a.txt').read_bytes() == b'a.txt 1\r\n'
+    assert (cwd / 'b.txt').read_bytes() == b'b.txt 1\r\n'
+
+    prepare._template_environments.clear()
+    (cwd / 'a.txt').unlink()
+    prepare.write_file_from_template(templates_path / 'a.txt', cwd / 'a.txt', {'value': 2}, cwd, verbose=False)
+    assert (cwd / 'a.txt').read_bytes() == b'a.txt 2\r\n'
+    assert list((cwd / 'cache').iterdir()).__len__() == 2
+
+
+def make_distribution(site_path, name, files):
+    dist_info_path = site_path / f'{name}-1.0.dist-info'
+    dist_info_path.mkdir(parents=True)
+    (dist_info_path / 'METADATA').write_text(f'Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n')
+    (dist_info_path / 'RECORD').write_text(''.join(f'{file},,\n' for file in files))
+    return importlib_metadata.PathDistribution(dist_info_path)
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_all_imports_SHOULD_keep_cache_of_other_repos(cwd, monkeypatch):
+    colreqs = pytest.importorskip('repoassist.colreqs')
+    monkeypatch.setattr(colreqs.settings, 'IMPORTS_CACHE_PATH', cwd / 'cache' / 'imports.json')
+    first_repo_path = cwd / 'first'
+    first_repo_path.mkdir()
+    (first_repo_path / 'main.py').write_text('import requests\nfrom google.protobuf import message\n')
+    second_repo_path = cwd / 'second'
+    second_repo_path.mkdir()
+    (second_repo_path / 'main.py').write_text('import jinja2\n')
+
+    assert colreqs._get_all_imports(first_repo_path) == {'requests', 'google.protobuf', 'google.protobuf.message'}
+    assert colreqs._get_all_imports(second_repo_path) == {'jinja2'}
+
+    cache = colreqs._read_imports_cache()
+    assert sorted(cache) == sorted([os.path.realpath(first_repo_path), os.path.realpath(second_repo_path)])
+
+    monkeypatch.setattr(colreqs, '_parse_imports', None)
+    assert colreqs._get_all_imports(first_repo_path) == {'requests', 'google.protobuf', 'google.protobuf.message'}
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_resolve_namespace_distributions_SHOULD_pick_distribution_by_submodule(cwd):
+    colreqs = pytest.importorskip('repoassist.colreqs')
+    protobuf = make_distribution(cwd, 'protobuf', ['google/protobuf/__init__.py', 'google/protobuf/message.py'])
+    storage = make_distribution(cwd, 'google-cloud-storage', ['google/cloud/storage/__init__.py'])
+    distributions = [protobuf, storage]
+
+    assert colreqs._resolve_namespace_distributions(
+        'google', {'google.protobuf', 'google.protobuf.message'}, distributions) == [protobuf]
+    assert colreqs._resolve_namespace_distributions('google', {'google.cloud.storage'}, distributions) == [storage]
+    assert colreqs._resolve_namespace_distributions('google', {'google'}, distributions) == []
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_fix_file_SHOULD_keep_crlf_line_endings(cwd):
+    formatter = pytest.importorskip('repoassist.formatter')
+    file_path = cwd / 'module.py'
+    file_path.write_bytes(b'import os\r\nx=os.sep\r\n')
+    (cwd / 'setup.cfg').write_text('[pycodestyle]\nmax-line-length = 119\n')
+
+    assert formatter._fix_file(file_path.__str__(), cwd / 'setup.cfg') == True
+    assert file_path.read_bytes() == b'import os\r\nx = os.sep\r\n'
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_lint_files_SHOULD_relint_cached_files_WHEN_linter_or_plugins_changed(repo, monkeypatch, caplog):
+    formatter = pytest.importorskip('repoassist.formatter')
+    if not shutil.which(formatter.settings.Tools.LINTER):
+        pytest.skip(f'{formatter.settings.Tools.LINTER} not found')
+    monkeypatch.setattr(formatter.settings, 'FORMATTER_CACHE_PATH', repo.parent / 'cache' / 'formatter.json')
+    (repo / 'setup.cfg').write_text('[flake8]\nmax-line-length = 119\n')
+    (repo / 'module.py').write_text('import os\n')
+    git(['add', 'setup.cfg', 'module.py'], repo)
+    git(['commit', '-q', '-m', 'Add module.py'], repo)
+
+    assert 'pycodestyle' in formatter._get_linter_version(repo)
+    assert formatter.lint_files(cwd=repo).__len__() == 1
+    (repo / 'module.py').write_text('import os\nprint(os.sep)\n')
+    assert formatter.lint_files(cwd=repo) == {}
+    assert formatter.lint_files(cwd=repo) == {}
+    assert '1 files checked, 1 from the cache' in caplog.text
+
+    caplog.clear()
+    monkeypatch.setattr(formatter, '_get_linter_version', lambda cwd: 'flake8 7.1.1 (new-plugin: 1.0)')
+    assert formatter.lint_files(cwd=repo) == {}
+    assert '1 files checked, 0 from the cache' in caplog.text
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_logger_SHOULD_be_importable_WHEN_repoassist_used_standalone(cwd):
+    shutil.copytree(Path(pygittools.__file__).parent, cwd / 'repoassist',
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    code = ('import json, logging\n'
+            'from repoassist import logger\n'
+            'record = logging.LogRecord("name", logging.INFO, "path", 1, "message", None, None)\n'
+            'print(json.loads(logger.JsonFormatter().format(record))["message"])\n')
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=dict(os.environ, PYTHONPATH=''),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8')
+
+    assert result.returncode == 0, result.stdout
+    assert result.stdout.strip() == 'message'
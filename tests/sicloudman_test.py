@@ -8,6 +8,8 @@ Tests need ftp account on a server.
 """
 
 
+import io
+import os
 import sys
 import stat
 import time
@@ -15,8 +17,12 @@ import copy
 import pytest
 import shutil
 import ftplib
+import hashlib
+import json
 import logging
 import tempfile
+import threading
+import subprocess
 from pathlib import Path
 from pprint import pprint
 from types import SimpleNamespace
@@ -65,6 +71,13 @@ def cwd():
         shutil.rmtree(workspace_path, ignore_errors=False, onerror=_error_remove_readonly)
 
 
+@pytest.fixture(autouse=True)
+def concurrency_limits_cache_path(tmp_path, monkeypatch):
+    cache_path = tmp_path / 'concurrency_limits.json'
+    monkeypatch.setattr(sicloudman, 'CONCURRENCY_LIMITS_CACHE_PATH', cache_path)
+    return cache_path
+
+
 @pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
 def test_get_latest_file_with_keyword_SHOULD_return_none_if_path_not_exists():
     assert sicloudman.CloudManager.get_latest_file_with_keyword('some_path', '.txt') == None
@@ -1011,3 +1024,742 @@ def test_download_file_SHOULD_not_download_file_if_already_exists(cwd, caplog):
     
     with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
         ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_get_outdated_files_SHOULD_return_missing_and_changed_files():
+    src_files = {
+        'missing.txt': sicloudman.FileEntry(path=Path('missing.txt'), size=10, mtime=100),
+        'resized.txt': sicloudman.FileEntry(path=Path('resized.txt'), size=10, mtime=100),
+        'newer.txt': sicloudman.FileEntry(path=Path('newer.txt'), size=10, mtime=200),
+        'same.txt': sicloudman.FileEntry(path=Path('same.txt'), size=10, mtime=100),
+        'older.txt': sicloudman.FileEntry(path=Path('older.txt'), size=10, mtime=50),
+    }
+    dst_files = {
+        'resized.txt': sicloudman.FileEntry(path=Path('resized.txt'), size=20, mtime=100),
+        'newer.txt': sicloudman.FileEntry(path=Path('newer.txt'), size=10, mtime=100),
+        'same.txt': sicloudman.FileEntry(path=Path('same.txt'), size=10, mtime=100),
+        'older.txt': sicloudman.FileEntry(path=Path('older.txt'), size=10, mtime=100),
+    }
+    
+    assert sicloudman.CloudManager._get_outdated_files(src_files, dst_files) == ['missing.txt', 'newer.txt', 'resized.txt']
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_sync_up_SHOULD_upload_only_missing_and_changed_files(cwd):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_2_release.txt').write_text('release 2')
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    Path(artifacts_path / 'test_1_dev.txt').write_text('dev 1')
+    
+    summary = cloud_manager.sync_up()
+    
+    assert summary.transferred.__len__() == 3
+    assert summary.bytes_transferred == summary.bytes_total
+    
+    Path(artifacts_path / 'test_2_release.txt').write_text('release 2 changed')
+    
+    summary = cloud_manager.sync_up()
+    cloud_files = cloud_manager.list_cloud()
+    
+    assert summary.transferred == [(cloud_manager._get_project_bucket_path() / 'release' / 'test_2_release.txt').as_posix()]
+    assert summary.skipped.__len__() == 2
+    assert summary.bytes_saved == len('release 1') + len('client 1')
+    assert set(cloud_files.release) == {'test_1_release.txt', 'test_2_release.txt'}
+    assert set(cloud_files.client) == {'test_1_client.txt'}
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_sync_down_SHOULD_download_only_missing_files(cwd):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_2_release.txt').write_text('release 2')
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    cloud_manager.sync_up()
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path / 'client').mkdir(parents=True)
+    
+    summary = cloud_manager.sync_down()
+    
+    assert summary.transferred.__len__() == 3
+    assert (artifacts_path / 'test_2_release.txt').read_text() == 'release 2'
+    assert (artifacts_path / 'client' / 'test_1_client.txt').read_text() == 'client 1'
+    
+    summary = cloud_manager.sync_down()
+    
+    assert summary.transferred == []
+    assert summary.bytes_saved == summary.bytes_total
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_upload_big_files_in_chunks_WHEN_chunk_size_set(cwd):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    cloud_manager.chunk_size = 1000
+    content = os.urandom(4500)
+    Path(artifacts_path / 'test_1_release.bin').write_bytes(content)
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    
+    uploaded_files_paths = cloud_manager.upload_artifacts(prompt=False)
+    cloud_files = cloud_manager.list_cloud()
+    
+    assert uploaded_files_paths.__len__() == 2
+    assert cloud_files.release == ['test_1_release.bin']
+    assert cloud_files.client == ['test_1_client.txt']
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_conn.cwd((cloud_manager._get_project_bucket_path() / 'release' / '.test_1_release.bin.chunks').as_posix())
+        assert set(ftp_conn.nlst()) == {'manifest.json', 'part-00000', 'part-00001', 'part-00002', 'part-00003', 'part-00004'}
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    
+    downloaded_file_path = cloud_manager.download_file(filename='test_1_release.bin')
+    
+    assert Path(downloaded_file_path).read_bytes() == content
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_download_file_SHOULD_verify_checksum_sidecar(cwd):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    
+    cloud_manager.upload_artifacts(prompt=False)
+    cloud_files = cloud_manager.list_cloud()
+    
+    assert cloud_files.release == ['test_1_release.txt']
+    
+    release_bucket_path = (cloud_manager._get_project_bucket_path() / 'release').as_posix()
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_conn.cwd(release_bucket_path)
+        checksum_lines = []
+        ftp_conn.retrlines('RETR test_1_release.txt.sha256', checksum_lines.append)
+        ftp_conn.storbinary('STOR test_1_release.txt', io.BytesIO(b'release 1 tampered'))
+    
+    assert checksum_lines == [f"{hashlib.sha256(b'release 1').hexdigest()}  test_1_release.txt"]
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    
+    assert Path(cloud_manager.download_file(filename='test_1_client.txt')).read_text() == 'client 1'
+    with pytest.raises(sicloudman.ChecksumError):
+        cloud_manager.download_file(filename='test_1_release.txt')
+    assert not (artifacts_path / 'test_1_release.txt').exists()
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_cloud_agent_SHOULD_serve_clients_with_pooled_sessions(cwd):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        cloud_manager._create_buckets_tree(ftp_conn)
+    
+    socket_path = Path(tempfile.mkdtemp()) / 'agent.sock'
+    agent = sicloudman.CloudAgent(cloud_manager, socket_path, workers=2)
+    agent_thread = threading.Thread(target=agent.serve_forever)
+    agent_thread.start()
+    while not socket_path.exists():
+        time.sleep(0.01)
+    
+    try:
+        with sicloudman.CloudAgentClient(socket_path, 'job_1') as client_1, \
+                sicloudman.CloudAgentClient(socket_path, 'job_2') as client_2:
+            client_1.upload_file(artifacts_path / 'test_1_release.txt', 'release')
+            client_2.upload_file(artifacts_path / 'test_1_client.txt', 'client')
+            cloud_files = client_1.list_cloud()
+            
+            assert client_2.list_cloud() == cloud_files
+            assert cloud_files.release == ['test_1_release.txt']
+            assert cloud_files.client == ['test_1_client.txt']
+            
+            downloaded_file_path = client_2.download_file('test_1_release.txt', cwd / 'downloads')
+            
+            assert Path(downloaded_file_path).read_text() == 'release 1'
+            with pytest.raises(sicloudman.FileNotFoundError):
+                client_1.download_file('test_2_release.txt')
+    finally:
+        agent.shutdown()
+        agent_thread.join()
+    
+    assert agent.session_pool.opened == 1
+    assert agent.session_pool.reused == 4
+    assert not socket_path.exists()
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_main_SHOULD_execute_batch_script_in_one_session(cwd, monkeypatch):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    Path(cwd / 'test_2_release.txt').write_text('release 2')
+    script_path = cwd / 'script.txt'
+    script_path.write_text('# Upload artifacts and a specified file\n'
+                           'upload-artifacts\n'
+                           '\n'
+                           f"upload '{(cwd / 'test_2_release.txt').as_posix()}' release\n"
+                           'list\n')
+    
+    open_connection = sicloudman.CloudManager._open_connection
+    opened_connections = []
+    def spy_open_connection(self):
+        opened_connections.append(self.credentials.server)
+        return open_connection(self)
+    monkeypatch.setattr(sicloudman.CloudManager, '_open_connection', spy_open_connection)
+    
+    argv = [script_path.as_posix(), '--artifacts-path', artifacts_path.as_posix(),
+            '--bucket', 'release:_release', '--bucket', 'client:_client',
+            '--credentials-path', (cwd / sicloudman.CLOUD_CREDENTIALS_FILENAME).as_posix()]
+    
+    assert sicloudman.main(argv) == 0
+    assert opened_connections.__len__() == 1
+    assert set(cloud_manager.list_cloud().release) == {'test_1_release.txt', 'test_2_release.txt'}
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    script_path.write_text('download test_2_release.txt\n')
+    
+    assert sicloudman.main(argv) == 0
+    assert (artifacts_path / 'test_2_release.txt').read_text() == 'release 2'
+    
+    script_path.write_text('download test_1_release.txt\nupload test_1_release.txt\n')
+    
+    assert sicloudman.main(argv) == 1
+    assert not (artifacts_path / 'test_1_release.txt').exists()
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+def test_concurrency_controller_SHOULD_increase_limit_WHILE_throughput_improves_and_back_off_on_errors():
+    sicloudman.ConcurrencyController.forget_learned_limits()
+    controller = sicloudman.ConcurrencyController(('server', '21'), max_limit=4)
+    
+    assert controller.limit == sicloudman.CONCURRENCY_INITIAL_LIMIT
+    
+    for _ in range(controller.limit):
+        controller.record_success(1000)
+    
+    assert controller.limit == 3
+    assert sicloudman.ConcurrencyController.get_learned_limit(('server', '21')) == 3
+    
+    controller._window_started -= 1000
+    for _ in range(controller.limit):
+        controller.record_success(1)
+    
+    assert controller.limit == 3
+    
+    assert controller.record_backoff()
+    assert controller.limit == 1
+    assert sicloudman.ConcurrencyController(('server', '21'), max_limit=8).limit == 1
+    assert sicloudman.ConcurrencyController(('other_server', '21'), max_limit=8).limit == sicloudman.CONCURRENCY_INITIAL_LIMIT
+    
+    for _ in range(sicloudman.CONCURRENCY_MAX_BACKOFFS - 1):
+        assert controller.record_backoff()
+    assert not controller.record_backoff()
+    
+    assert sicloudman.ConcurrencyController.is_backoff_error(ftplib.error_temp('421 Too many connections'))
+    assert sicloudman.ConcurrencyController.is_backoff_error(ftplib.error_temp('425 Can not open data connection'))
+    assert sicloudman.ConcurrencyController.is_backoff_error(TimeoutError())
+    assert not sicloudman.ConcurrencyController.is_backoff_error(ftplib.error_temp('450 File unavailable'))
+    assert not sicloudman.ConcurrencyController.is_backoff_error(ftplib.error_perm('550 Not found'))
+    sicloudman.ConcurrencyController.forget_learned_limits()
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_concurrency_controller_SHOULD_start_from_learned_limit_WHEN_new_process(cwd, concurrency_limits_cache_path):
+    sicloudman.ConcurrencyController(('server', '21'), max_limit=8).record_backoff()
+    sicloudman.ConcurrencyController(('other_server', '2121'), max_limit=8)._remember()
+    
+    code = ('import sys, sicloudman\n'
+            'sicloudman.CONCURRENCY_LIMITS_CACHE_PATH = sicloudman.Path(sys.argv[1])\n'
+            'print(sicloudman.ConcurrencyController(("server", "21"), max_limit=8).limit, '
+            'sicloudman.ConcurrencyController(("other_server", "2121"), max_limit=8).limit, '
+            'sicloudman.ConcurrencyController(("new_server", "21"), max_limit=8).limit)\n')
+    output = subprocess.run([sys.executable, '-c', code, str(concurrency_limits_cache_path)], check=True,
+                            stdout=subprocess.PIPE, encoding='utf-8', cwd=Path(sicloudman.__file__).parent).stdout
+    
+    assert output.split() == ['1', str(sicloudman.CONCURRENCY_INITIAL_LIMIT), str(sicloudman.CONCURRENCY_INITIAL_LIMIT)]
+    assert json.loads(concurrency_limits_cache_path.read_text()) == {'server:21': 1,
+                                                                   'other_server:2121': sicloudman.CONCURRENCY_INITIAL_LIMIT}
+    
+    concurrency_limits_cache_path.write_text('not json')
+    assert sicloudman.ConcurrencyController(('server', '21'), max_limit=8).limit == sicloudman.CONCURRENCY_INITIAL_LIMIT
+    sicloudman.ConcurrencyController.forget_learned_limits()
+    assert not concurrency_limits_cache_path.exists()
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_execute_transfers_SHOULD_retry_transfers_with_lower_concurrency_WHEN_too_many_connections(cwd, caplog):
+    sicloudman.ConcurrencyController.forget_learned_limits()
+    cloud_manager = sicloudman.CloudManager(cwd, [sicloudman.Bucket(name='release', keywords=['_release'])],
+                                            credentials_path=TEST_CLOUD_CREDENTIALS_PATH, cwd=cwd)
+    cloud_manager._get_project_bucket_path()
+    transfers = [sicloudman.Transfer(bucket_name='release', local_path=Path(f'test_{i}_release.txt'), size=1, mtime=0)
+                 for i in range(6)]
+    refused = []
+    
+    def handler(ftp_conn, transfer, resume):
+        if not refused:
+            refused.append(transfer)
+            raise ftplib.error_temp('421 Too many connections')
+    
+    completed = cloud_manager._execute_transfers(transfers, handler, workers=4)
+    
+    assert sorted(completed) == sorted(transfers)
+    assert refused.__len__() == 1
+    assert 'refused more sessions (421 Too many connections)' in caplog.text
+    assert sicloudman.ConcurrencyController.get_learned_limit(cloud_manager._get_concurrency_controller(4).key) is not None
+    
+    with pytest.raises(ftplib.error_perm):
+        cloud_manager._execute_transfers(transfers, lambda ftp_conn, transfer, resume: ftp_conn.cwd('not_existing_dir'), 4)
+    sicloudman.ConcurrencyController.forget_learned_limits()
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_execute_plan_and_download_file_SHOULD_resume_interrupted_transfers(cwd, monkeypatch, caplog):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='client', keywords=['_client'])])
+    monkeypatch.setattr(sicloudman, 'RETRY_BASE_DELAY', 0.01)
+    content = os.urandom(5 * 8192)
+    Path(artifacts_path / 'test_1_release.bin').write_bytes(content)
+    Path(artifacts_path / 'test_1_client.txt').write_text('client 1')
+    
+    def interrupt_once(cls, method_name):
+        method = getattr(cls, method_name)
+        calls = []
+        def interrupted_method(self, *args, **kwargs):
+            calls.append(args)
+            if calls.__len__() == 3:
+                raise ConnectionResetError('Connection reset by peer')
+            return method(self, *args, **kwargs)
+        monkeypatch.setattr(cls, method_name, interrupted_method)
+    
+    interrupt_once(sicloudman._FileSlice, 'read')
+    plan = cloud_manager.plan_artifacts(prompt=False)
+    uploaded_files_paths = cloud_manager.execute_plan(plan)
+    
+    assert uploaded_files_paths.__len__() == 2
+    assert plan.retries == 1
+    assert 'Connection reset by peer' in caplog.text
+    assert 'Upload of test_1_release.bin resumed at' in caplog.text
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    interrupt_once(sicloudman._HashingWriter, '__call__')
+    
+    downloaded_file_path = cloud_manager.download_file(filename='test_1_release.bin')
+    
+    assert Path(downloaded_file_path).read_bytes() == content
+    assert 'Download of test_1_release.bin resumed at 16384 B.' in caplog.text
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_sync_up_SHOULD_overwrite_changed_remote_file_WHEN_retried_before_store(cwd, monkeypatch, caplog):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release'])])
+    monkeypatch.setattr(sicloudman, 'RETRY_BASE_DELAY', 0.01)
+    Path(artifacts_path / 'test_1_release.bin').write_bytes(os.urandom(1000))
+    cloud_manager.sync_up()
+    
+    content = os.urandom(2000)
+    Path(artifacts_path / 'test_1_release.bin').write_bytes(content)
+    storbinary = ftplib.FTP.storbinary
+    calls = []
+    def fail_first_store(self, cmd, *args, **kwargs):
+        calls.append(cmd)
+        if cmd == 'STOR test_1_release.bin' and calls.count(cmd) == 1:
+            raise ftplib.error_temp('450 File unavailable')
+        return storbinary(self, cmd, *args, **kwargs)
+    monkeypatch.setattr(ftplib.FTP, 'storbinary', fail_first_store)
+    
+    summary = cloud_manager.sync_up()
+    
+    assert summary.retries == 1
+    assert 'resumed' not in caplog.text
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    downloaded_file_path = cloud_manager.download_file(filename='test_1_release.bin')
+    
+    assert Path(downloaded_file_path).read_bytes() == content
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_bundle_files_WHEN_bucket_bundled(cwd, caplog):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='release', keywords=['_release']), 
+                                                               sicloudman.Bucket(name='logs', keywords=['.log'], bundle=True)])
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    for i in range(20):
+        Path(artifacts_path / f'target_{i}.log').write_text(f'log {i}\n' * (i * 100))
+    
+    uploaded_files_paths = cloud_manager.upload_artifacts(prompt=False)
+    cloud_files = cloud_manager.list_cloud()
+    
+    assert uploaded_files_paths.__len__() == 21
+    assert set(cloud_files.logs) == {f'target_{i}.log' for i in range(20)}
+    assert cloud_files.release == ['test_1_release.txt']
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_conn.cwd((cloud_manager._get_project_bucket_path() / 'logs').as_posix())
+        bucket_contents = ftp_conn.nlst()
+    
+    assert bucket_contents.__len__() == 3
+    
+    Path(artifacts_path / 'target_20.log').write_text('log 20')
+    cloud_manager.upload_artifacts(prompt=False)
+    
+    assert 'target_0.log already exists in the server bucket' in caplog.text
+    assert set(cloud_manager.list_cloud().logs) == {f'target_{i}.log' for i in range(21)}
+    
+    shutil.rmtree(artifacts_path)
+    Path(artifacts_path).mkdir()
+    
+    cloud_manager.download_file(filename='target_13.log')
+    cloud_manager.download_file(filename='target_20.log')
+    
+    assert Path(artifacts_path / 'target_13.log').read_text() == 'log 13\n' * 1300
+    assert Path(artifacts_path / 'target_20.log').read_text() == 'log 20'
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_delete_partial_bundle_WHEN_archive_writing_fails(cwd, caplog, monkeypatch):
+    bucket_paths = SimpleNamespace(
+        main_bucket_path='test_cloud',
+        client_name='sicloudman_client',
+        project_name='sicloudman_project')
+    cloud_manager, artifacts_path = get_updated_cloud_manager(cwd, bucket_paths,
+                                                              [sicloudman.Bucket(name='logs', keywords=['.log'], bundle=True)])
+    for i in range(3):
+        Path(artifacts_path / f'target_{i}.log').write_text(f'log {i}\n' * 10000)
+    addfile = sicloudman.tarfile.TarFile.addfile
+    added = []
+    
+    def failing_addfile(tar, tarinfo, fileobj=None):
+        if added:
+            raise PermissionError(f'{tarinfo.name} not readable')
+        added.append(tarinfo.name)
+        addfile(tar, tarinfo, fileobj)
+    
+    monkeypatch.setattr(sicloudman.tarfile.TarFile, 'addfile', failing_addfile)
+    
+    with pytest.raises(sicloudman.FtpError, match='not readable'):
+        cloud_manager.upload_artifacts(prompt=False)
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_conn.cwd((cloud_manager._get_project_bucket_path() / 'logs').as_posix())
+        assert ftp_conn.nlst() == []
+    assert 'Deleting the partial archive from the server' in caplog.text
+    
+    monkeypatch.setattr(sicloudman.tarfile.TarFile, 'addfile', addfile)
+    cloud_manager.upload_artifacts(prompt=False)
+    
+    assert set(cloud_manager.list_cloud().logs) == {f'target_{i}.log' for i in range(3)}
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, cloud_manager._get_project_bucket_path().parent.as_posix())
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_plan_artifacts_SHOULD_collect_latest_files_per_bucket(cwd):
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    cloud_manager = sicloudman.CloudManager(artifacts_path,
+                                            [sicloudman.Bucket(name='release', keywords=['_release', '.whl']), 
+                                             sicloudman.Bucket(name='client', keywords=['_client'])], cwd=cwd)
+    
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    Path(artifacts_path / 'test_1_client.txt').touch()
+    time.sleep(1)
+    Path(artifacts_path / 'test_2_release.txt').write_text('release 2')
+    Path(artifacts_path / 'test_2.whl').write_text('wheel')
+    Path(artifacts_path / 'test_2_dev.txt').touch()
+    
+    plan = cloud_manager.plan_artifacts(prompt=False)
+    
+    assert plan.buckets == ['release', 'client']
+    assert [transfer.local_path.name for transfer in plan.get_bucket_transfers('release')] == ['test_2_release.txt', 'test_2.whl']
+    assert [transfer.local_path.name for transfer in plan.get_bucket_transfers('client')] == ['test_1_client.txt']
+    assert plan.bytes_total == len('release 2') + len('wheel')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_not_connect_WHEN_dry_run(cwd, caplog):
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    credentials = sicloudman.Credentials(
+        server='not_existing_server',
+        username='user',
+        password='pass',
+        main_bucket_path='main_bucket',
+        client_name='client',
+        project_name='project',
+    )
+    cloud_manager = sicloudman.CloudManager(artifacts_path,
+                                            [sicloudman.Bucket(name='release', keywords=['_release'])], 
+                                            credentials=credentials, cwd=cwd)
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    
+    cloud_manager._logger.setLevel(logging.INFO)
+    uploaded_files_paths = cloud_manager.upload_artifacts(prompt=False, dry_run=True)
+    
+    assert uploaded_files_paths == ['/main_bucket/client/project/release/test_1_release.txt']
+    assert f"1 files, {len('release 1')} B in 1 buckets" in caplog.text
+    assert 'round trips' in caplog.text
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_mirror_report_SHOULD_check_policy_properly():
+    credentials = sicloudman.Credentials(server='my_server', username='user', password='pass', main_bucket_path='main_bucket')
+    report = sicloudman.MirrorReport([
+        sicloudman.DestinationResult(credentials, ['file'], None),
+        sicloudman.DestinationResult(credentials, ['file'], None),
+        sicloudman.DestinationResult(credentials, [], sicloudman.FtpError('error', None)),
+    ])
+    
+    assert report.is_policy_met(sicloudman.MirrorPolicy.QUORUM) == True
+    assert report.is_policy_met(sicloudman.MirrorPolicy.ALL) == False
+
+
+def get_mirror_credentials(cwd, client_names):
+    cloud_manager = sicloudman.CloudManager('artifacts',
+                                            [sicloudman.Bucket(name='release', keywords=['_release'])], 
+                                            credentials_path=TEST_CLOUD_CREDENTIALS_PATH, cwd=cwd)
+    cloud_manager._get_project_bucket_path()
+    credentials_list = []
+    for client_name in client_names:
+        credentials = copy.copy(cloud_manager.credentials)
+        credentials.main_bucket_path = 'test_cloud'
+        credentials.client_name = client_name
+        credentials.project_name = 'sicloudman_project'
+        credentials_list.append(credentials)
+        
+    return credentials_list
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_upload_files_to_all_destinations_WHEN_mirrors(cwd):
+    credentials_list = get_mirror_credentials(cwd, ['sicloudman_client', 'sicloudman_mirror'])
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    cloud_manager = sicloudman.CloudManager(artifacts_path, [sicloudman.Bucket(name='release', keywords=['_release'])],
+                                            credentials=credentials_list, cwd=cwd)
+    Path(artifacts_path / 'test_1_release.txt').touch()
+    
+    uploaded_files = cloud_manager.upload_artifacts(prompt=False)
+    report = cloud_manager.mirror_report
+    
+    assert uploaded_files == ['/test_cloud/sicloudman_client/sicloudman_project/release/test_1_release.txt']
+    assert report.failed == []
+    assert [result.uploaded_files for result in report.results] == [
+        ['/test_cloud/sicloudman_client/sicloudman_project/release/test_1_release.txt'],
+        ['/test_cloud/sicloudman_mirror/sicloudman_project/release/test_1_release.txt'],
+    ]
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_client')
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_mirror')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_file_SHOULD_return_primary_path_WHEN_mirrors(cwd):
+    credentials_list = get_mirror_credentials(cwd, ['sicloudman_client', 'sicloudman_mirror'])
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    cloud_manager = sicloudman.CloudManager(artifacts_path, [sicloudman.Bucket(name='release', keywords=['_release'])],
+                                            credentials=credentials_list, cwd=cwd)
+    file_path = artifacts_path / 'test_1_release.txt'
+    file_path.touch()
+    
+    uploaded_file = cloud_manager.upload_file(file_path=file_path, bucket_name='release', prompt=False)
+    
+    assert uploaded_file == '/test_cloud/sicloudman_client/sicloudman_project/release/test_1_release.txt'
+    assert len(cloud_manager.mirror_report.succeeded) == 2
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_client')
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_mirror')
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_artifacts_SHOULD_apply_mirror_policy_WHEN_destination_fails(cwd):
+    credentials_list = get_mirror_credentials(cwd, ['sicloudman_client', 'sicloudman_mirror', 'sicloudman_broken'])
+    credentials_list[2].main_bucket_path = 'main_bucket_dummy_dir'
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    Path(artifacts_path / 'test_1_release.txt').touch()
+    
+    cloud_manager = sicloudman.CloudManager(artifacts_path, [sicloudman.Bucket(name='release', keywords=['_release'])],
+                                            credentials=credentials_list, cwd=cwd, mirror_policy='quorum')
+    uploaded_files = cloud_manager.upload_artifacts(prompt=False)
+    report = cloud_manager.mirror_report
+    
+    assert uploaded_files == ['/test_cloud/sicloudman_client/sicloudman_project/release/test_1_release.txt']
+    assert report.succeeded.__len__() == 2
+    assert isinstance(report.failed[0].error, sicloudman.BucketNotFoundError)
+    
+    with pytest.raises(sicloudman.MirrorError):
+        cloud_manager.mirror_plan(cloud_manager.plan_artifacts(prompt=False), policy=sicloudman.MirrorPolicy.ALL)
+    
+    with ftplib.FTP(cloud_manager.credentials.server, cloud_manager.credentials.username, cloud_manager.credentials.password) as ftp_conn:
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_client')
+        ftp_rmtree(ftp_conn, '/test_cloud/sicloudman_mirror')
+
+
+@pytest.fixture()
+def tls_credentials(cwd):
+    pytest.importorskip('OpenSSL')
+    servers = pytest.importorskip('pyftpdlib.servers')
+    handlers = pytest.importorskip('pyftpdlib.handlers')
+    authorizers = pytest.importorskip('pyftpdlib.authorizers')
+    if not shutil.which('openssl'):
+        pytest.skip('openssl not found')
+    
+    cert_path = cwd / 'cert.pem'
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                    '-keyout', str(cert_path), '-out', str(cert_path)], check=True, capture_output=True)
+    ftp_root = cwd / 'ftp_root'
+    (ftp_root / 'test_cloud').mkdir(parents=True)
+    
+    authorizer = authorizers.DummyAuthorizer()
+    authorizer.add_user('user', 'pass', str(ftp_root), perm='elradfmwMT')
+    handler = type('TlsHandler', (handlers.TLS_FTPHandler,), {})
+    handler.authorizer = authorizer
+    handler.certfile = str(cert_path)
+    handler.tls_control_required = True
+    handler.tls_data_required = True
+    server = servers.FTPServer(('localhost', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'timeout': 0.1}, daemon=True)
+    thread.start()
+    
+    yield sicloudman.Credentials(server='localhost', username='user', password='pass', 
+                                 main_bucket_path='test_cloud', project_name='sicloudman_project', 
+                                 port=str(server.address[1]), use_tls='yes', tls_cafile=str(cert_path))
+    
+    server.close_all()
+    thread.join()
+
+
+@pytest.mark.skipif(RUN_ALL_TESTS == False, reason='Skipped on demand')
+def test_upload_and_download_SHOULD_reuse_tls_session_WHEN_ftps(cwd, tls_credentials, monkeypatch):
+    reused_sessions = []
+    ntransfercmd = sicloudman._ReusedSessionFTP_TLS.ntransfercmd
+    def ntransfercmd_spy(self, cmd, rest=None):
+        conn, size = ntransfercmd(self, cmd, rest)
+        reused_sessions.append(conn.session_reused)
+        return conn, size
+    monkeypatch.setattr(sicloudman._ReusedSessionFTP_TLS, 'ntransfercmd', ntransfercmd_spy)
+    
+    artifacts_path = cwd / 'artifacts'
+    artifacts_path.mkdir()
+    Path(artifacts_path / 'test_1_release.txt').write_text('release 1')
+    cloud_manager = sicloudman.CloudManager(artifacts_path, [sicloudman.Bucket(name='release', keywords=['_release'])],
+                                            credentials=tls_credentials, cwd=cwd)
+    
+    cloud_manager.upload_artifacts(prompt=False)
+    (artifacts_path / 'test_1_release.txt').unlink()
+    downloaded_file_path = cloud_manager.download_file(filename='test_1_release.txt')
+    
+    assert Path(downloaded_file_path).read_text() == 'release 1'
+    assert (cwd / 'ftp_root' / 'test_cloud' / 'sicloudman_project' / 'release' / 'test_1_release.txt').exists()
+    assert reused_sessions and all(reused_sessions)
+
+
+def test_enable_queue_logging_SHOULD_write_json_records_from_background_thread():
+    stream = io.StringIO()
+    logger = logging.getLogger('sicloudman_queue_test')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    stream_handler = logging.StreamHandler(stream)
+    logger.addHandler(stream_handler)
+    
+    listener = sicloudman.enable_queue_logging(logger, json_format=True)
+    logger.info('file uploaded')
+    sicloudman.disable_queue_logging()
+    
+    assert listener is not None
+    assert logger.handlers == [stream_handler]
+    record = json.loads(stream.getvalue().splitlines()[0])
+    assert record['message'] == 'file uploaded'
+    assert record['level'] == 'INFO'
+    assert record['name'] == 'sicloudman_queue_test'